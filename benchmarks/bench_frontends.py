@@ -0,0 +1,60 @@
+"""Cold start time of the frontends, from launching Python to the first frame drawn.
+
+Each run starts a new interpreter, so nothing is imported or cached in advance. The
+time of an interpreter doing nothing is measured too, as a baseline.
+"""
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import ROOT, Skip, benchmark
+
+SCRIPTS = {
+    "interpreter": "pass",
+    "tkinter": """
+from python_guis.tkinter.gui_tkinter import BeetlePicker
+
+app = BeetlePicker()
+app.update()
+app.close()
+""",
+    "pyside": """
+from PySide2 import QtWidgets
+from python_guis.pyside.gui_pyside import MySimpleGUI
+
+app = QtWidgets.QApplication([])
+gui = MySimpleGUI()
+gui.show()
+app.processEvents()
+gui.close()
+""",
+    "kivy": """
+from kivy.clock import Clock
+from python_guis.kivy.gui_kivy import BeetleApp
+
+app = BeetleApp()
+Clock.schedule_once(lambda dt: app.stop(), 0)
+app.run()
+""",
+}
+
+ENVIRONMENT = dict(
+    PYTHONPATH=str(ROOT),
+    QT_QPA_PLATFORM="offscreen",
+    KIVY_NO_ARGS="1",
+    KIVY_NO_CONSOLELOG="1",
+)
+
+
+@benchmark("startup", params=[dict(frontend=name) for name in SCRIPTS], repeat=3)
+def startup(frontend):
+    command = [sys.executable, "-c", SCRIPTS[frontend]]
+    env = dict(os.environ, **ENVIRONMENT)
+
+    def run():
+        process = subprocess.run(command, env=env, cwd=ROOT, capture_output=True)
+        if process.returncode != 0:
+            lines = process.stderr.decode(errors="replace").strip().splitlines()
+            raise Skip(lines[-1] if lines else f"exit code {process.returncode}")
+
+    return run
@@ -0,0 +1,103 @@
+"""Benchmarks of the model: splines, segmentation and drawing the nodes."""
+from types import SimpleNamespace
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+import numpy as np  # noqa: E402
+
+from benchmarks.harness import benchmark, grid, sweep  # noqa: E402
+from python_guis import model  # noqa: E402
+
+ITERATIONS = 500
+"""Iterations of every segmentation, so each case does a fixed amount of work."""
+
+
+def circle(n: int, radius: float, center: float) -> np.ndarray:
+    """Nodes on a circle, as (x, y) coordinates."""
+    angle = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return center + radius * np.stack((np.cos(angle), np.sin(angle)), axis=-1)
+
+
+def blob(size: int) -> np.ndarray:
+    """Bright noisy disk on a dark background, a simple image to segment."""
+    rng = np.random.default_rng(42)
+    rows, cols = np.mgrid[:size, :size]
+    radius = np.hypot(rows - size / 2, cols - size / 2)
+    image = (radius < size / 4).astype(float)
+    return image + rng.normal(scale=0.1, size=image.shape)
+
+
+@benchmark(
+    "model.spline",
+    params=grid(nodes=[8, 64], resolution=[360, 3600], uniform=[False, True]),
+)
+def spline(nodes, resolution, uniform):
+    points = circle(nodes, 100, 200)
+    return lambda: model.spline(points, resolution, uniform=uniform)
+
+
+@benchmark(
+    "model.segment_one_image",
+    params=sweep(
+        dict(size=512, resolution=360, sigma=1),
+        size=[256, 512, 1024],
+        resolution=[100, 360, 1000],
+        sigma=[1, 3, 5],
+    ),
+    repeat=3,
+)
+def segment_one_image(size, resolution, sigma):
+    image = blob(size)
+    # Close to the edge of the disk, at size / 4, and never converging, so the time
+    # depends on the parameters rather than on how soon the snake stops
+    nodes = circle(8, 0.3 * size, size / 2)
+
+    def run():
+        # The filtered image and its energy gradient are cached, so the caches are
+        # emptied to time them as well
+        model.filter_cache.clear()
+        model.gradient_cache.clear()
+        model.segment_one_image(
+            image,
+            nodes,
+            sigma=sigma,
+            resolution=resolution,
+            convergence=0,
+            max_num_iter=ITERATIONS,
+        )
+
+    return run
+
+
+def _figure(size: int):
+    figure = Figure()
+    canvas = FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.imshow(blob(size), cmap="binary_r")
+    canvas.draw()
+    return canvas, axes
+
+
+@benchmark("model.add_node", params=grid(size=[512, 2048], nodes=[3, 50]))
+def add_node(size, nodes):
+    canvas, axes = _figure(size)
+    initial = [tuple(xy) for xy in circle(nodes, size / 3, size / 2)]
+    points = list(initial)
+    event = SimpleNamespace(inaxes=axes, xdata=size / 2, ydata=size / 2)
+
+    def run():
+        points[:] = initial
+        model.add_node(event, points, canvas)
+
+    return run
+
+
+@benchmark("agg.redraw", params=grid(size=[512, 2048]))
+def redraw(size):
+    canvas, axes = _figure(size)
+    model.node_overlay(axes, canvas).update(circle(8, size / 3, size / 2))
+    return canvas.draw
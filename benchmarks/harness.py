@@ -0,0 +1,115 @@
+"""Minimal framework to register, time and report benchmarks.
+
+A benchmark is a function that takes its parameters as keyword arguments, does any
+setup needed and returns the callable to time. It can raise Skip if it can not run
+in the current environment, eg. when a GUI toolkit is not installed.
+"""
+from itertools import product
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from importlib import import_module
+from pathlib import Path
+from time import perf_counter
+from timeit import Timer
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class Skip(Exception):
+    """Raised by benchmarks that can not run in this environment."""
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Callable[..., Callable[[], object]]
+    params: List[Dict]
+    repeat: int
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def grid(**values: Sequence) -> List[Dict]:
+    """All the combinations of the values of each parameter."""
+    return [dict(zip(values, combination)) for combination in product(*values.values())]
+
+
+def sweep(defaults: Dict, **values: Sequence) -> List[Dict]:
+    """Varies one parameter at a time, keeping the others at their default."""
+    cases = [dict(defaults)]
+    for name, options in values.items():
+        cases += [{**defaults, name: v} for v in options if v != defaults[name]]
+    return cases
+
+
+def benchmark(name: str, params: Optional[List[Dict]] = None, repeat: int = 5):
+    """Registers the decorated function as a benchmark, run once for each params."""
+
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, setup, params or [{}], repeat))
+        return setup
+
+    return register
+
+
+def measure(fn: Callable[[], object], repeat: int) -> List[float]:
+    """Time per call of fn, in seconds, for each of the repeats.
+
+    Fast functions are called as many times as needed to take at least 0.2 s in each
+    repeat. That first calibration also serves as a warm up.
+    """
+    number, _ = Timer(fn, timer=perf_counter).autorange()
+    timer = Timer(fn, timer=perf_counter)
+    return [t / number for t in timer.repeat(repeat=repeat, number=number)]
+
+
+def run(benchmark: Benchmark, params: Dict, repeat: Optional[int] = None) -> Dict:
+    """Runs a benchmark for a set of params, returning its results."""
+    result: Dict = dict(name=benchmark.name, params=params)
+    try:
+        times = measure(benchmark.setup(**params), repeat or benchmark.repeat)
+    except Skip as reason:
+        return dict(result, skipped=str(reason))
+
+    return dict(
+        result,
+        times=times,
+        min=min(times),
+        median=statistics.median(times),
+        mean=statistics.mean(times),
+        stdev=statistics.stdev(times) if len(times) > 1 else 0.0,
+    )
+
+
+def _version(module: str) -> Optional[str]:
+    try:
+        return getattr(import_module(module), "__version__", "unknown")
+    except ImportError:
+        return None
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ("git",) + args, cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def metadata() -> Dict:
+    """Information about the code and the environment the benchmarks ran in."""
+    modules = ("numpy", "scipy", "skimage", "matplotlib", "PySide2", "kivy")
+    return dict(
+        date=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        commit=_git("rev-parse", "HEAD"),
+        dirty=bool(_git("status", "--porcelain", "--untracked-files=no")),
+        python=sys.version.split()[0],
+        platform=platform.platform(),
+        processor=platform.processor() or platform.machine(),
+        versions={module: _version(module) for module in modules},
+    )
@@ -0,0 +1,93 @@
+"""Runs the benchmarks and saves the results as JSON, optionally comparing them.
+
+From the root of the repository:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run -k spline --compare results.json
+
+The JSON file contains the metadata of the run - commit, platform and versions of the
+main dependencies - and, for each benchmark and set of parameters, the time per call
+in seconds of every repeat together with their summary statistics.
+"""
+from argparse import ArgumentParser
+import json
+from pathlib import Path
+import sys
+from typing import Dict, List, Optional, Sequence
+
+from benchmarks import bench_frontends, bench_model  # noqa: F401
+from benchmarks.harness import BENCHMARKS, metadata, run
+
+
+def _key(result: Dict) -> str:
+    params = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+    return f"{result['name']}({params})"
+
+
+def _format(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def compare(baseline: Dict, results: List[Dict], threshold: float) -> bool:
+    """Prints the change of the median times, returning if any got slower."""
+    previous = {_key(r): r for r in baseline["results"] if "median" in r}
+    print(f"\nCompared with {baseline['metadata'].get('commit', '?')[:10]}:")
+    regressed = False
+    for result in results:
+        key = _key(result)
+        if "median" not in result or key not in previous:
+            continue
+        ratio = result["median"] / previous[key]["median"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag, regressed = "  SLOWER", True
+        elif ratio < 1 / (1 + threshold):
+            flag = "  faster"
+        before = _format(previous[key]["median"])
+        print(f"{key:60} {before:>10} -> {_format(result['median']):>10}{flag}")
+    return regressed
+
+
+def main(args: Optional[Sequence[str]] = None) -> int:
+    parser = ArgumentParser(prog="python -m benchmarks.run", description=__doc__)
+    parser.add_argument("-o", "--output", type=Path, help="JSON file for the results.")
+    parser.add_argument(
+        "-k", dest="select", default="", help="Run only benchmarks with this in name."
+    )
+    parser.add_argument("-r", "--repeat", type=int, help="Override the repeats.")
+    parser.add_argument("--compare", type=Path, help="JSON results to compare with.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown reported as a regression (default: %(default)s).",
+    )
+    options = parser.parse_args(args)
+
+    results = []
+    for benchmark in BENCHMARKS:
+        if options.select not in benchmark.name:
+            continue
+        for params in benchmark.params:
+            result = run(benchmark, params, options.repeat)
+            if "skipped" in result:
+                print(f"{_key(result):60} skipped: {result['skipped']}")
+            else:
+                print(f"{_key(result):60} {_format(result['median']):>10}")
+            results.append(result)
+
+    report = dict(metadata=metadata(), results=results)
+    if options.output is not None:
+        options.output.write_text(json.dumps(report, indent=2))
+
+    if options.compare is not None:
+        baseline = json.loads(options.compare.read_text())
+        return int(compare(baseline, results, options.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""In-memory caches shared by the model and all the frontends."""
+from collections import OrderedDict
+import hashlib
+from threading import Lock
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Generic,
+    Hashable,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from typing import Protocol
+
+    class _Sized(Protocol):
+        @property
+        def nbytes(self) -> int:
+            ...
+
+
+V = TypeVar("V", bound="_Sized")
+"""Type of the values of an ArrayCache: arrays or anything else with nbytes."""
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    nbytes: int
+    max_bytes: int
+
+
+def image_key(image: np.ndarray) -> str:
+    """Returns a hash of the contents, shape and type of the image."""
+    data = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{data.dtype.str}{data.shape}".encode())
+    digest.update(data.reshape(-1).view(np.uint8).data)
+    return digest.hexdigest()
+
+
+class ArrayCache(Generic[V]):
+    """Least recently used cache of arrays bounded by their total size in bytes.
+
+    Cached arrays are made read only, so the callers can not modify them by accident.
+    Other values can be cached as long as they have an nbytes attribute, eg. objects
+    holding arrays. Setting max_bytes to 0 effectively disables the cache.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 2**20):
+        self._data: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int):
+        with self._lock:
+            self._max_bytes = value
+            self._evict()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Returns the array for that key, if any, marking it as recently used."""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: V) -> V:
+        """Adds the array to the cache, evicting old entries if needed."""
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self._data.pop(key).nbytes
+            self._data[key] = value
+            self.nbytes += value.nbytes
+            self._evict()
+        return value
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], V]) -> V:
+        """Returns the cached array or computes it and stores it in the cache."""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        """Removes all entries, but keeps the statistics."""
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def info(self) -> CacheInfo:
+        """Returns the hit/miss statistics and the current size of the cache."""
+        with self._lock:
+            return CacheInfo(
+                self.hits,
+                self.misses,
+                self.evictions,
+                len(self._data),
+                self.nbytes,
+                self._max_bytes,
+            )
+
+    def _evict(self):
+        while self._data and self.nbytes > self._max_bytes:
+            self.nbytes -= self._data.popitem(last=False)[1].nbytes
+            self.evictions += 1
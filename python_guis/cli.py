@@ -0,0 +1,285 @@
+"""Command line interface to segment many images without a GUI.
+
+The images to segment, and the nodes of their initial contours, are given either as
+a directory or as a manifest file:
+
+- In a directory, each image is paired with the node file next to it with the same
+  name and the .nodes.txt suffix, eg. beetle.jpg and beetle.nodes.txt. Images
+  without a node file are ignored.
+- A manifest is a CSV file with columns image and nodes, the paths to the image and
+  its node file, relative to the manifest.
+
+Node files are text files with two columns, the x and y coordinates of each node, as
+written by `numpy.savetxt`. Each contour is saved to the output directory as soon as
+it is ready, so a run that is interrupted can be resumed, skipping the images already
+segmented. Contours are saved as one text file per image or, with --format binary,
+all appended to a single contour file - see python_guis.contours - together with
+their image, nodes and parameters. Results are also kept in the result store shared
+with the GUIs - see python_guis.results - so images segmented before with the same
+nodes and parameters are not segmented again. For example:
+
+    python -m python_guis.cli images/ --output contours/ --workers 4 --sigma 2
+    python -m python_guis.cli manifest.csv --format binary --precision float32
+"""
+from argparse import ArgumentParser, Namespace
+import csv
+import logging
+import os
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set
+
+import numpy as np
+
+from python_guis.contours import ContourFile, ContourWriter
+from python_guis.images import IMAGE_SUFFIXES
+from python_guis.model import PRECISION, BatchResult, Job, segment_many
+from python_guis.results import RESULTS_PATH, ResultStore
+
+NODES_SUFFIX = ".nodes.txt"
+CONTOUR_SUFFIX = ".contour.txt"
+CONTOURS_FILE = "contours.bin"
+
+logger = logging.getLogger(__name__)
+
+
+class Item(NamedTuple):
+    name: str
+    image: Path
+    nodes: Path
+
+
+def from_directory(directory: Path) -> List[Item]:
+    """Images in the directory that have a node file next to them."""
+    items = []
+    for image in sorted(directory.iterdir()):
+        nodes = image.with_name(image.stem + NODES_SUFFIX)
+        if image.suffix.lower() in IMAGE_SUFFIXES and nodes.exists():
+            items.append(Item(image.stem, image, nodes))
+    return items
+
+
+def from_manifest(manifest: Path) -> List[Item]:
+    """Images and node files listed in a CSV manifest."""
+    with manifest.open(newline="") as f:
+        rows = list(csv.DictReader(f))
+
+    root = manifest.parent
+    items = [Item("", root / row["image"], root / row["nodes"]) for row in rows]
+    # The same file name could appear in several folders, so the position in the
+    # manifest is added to make the names unique
+    names = [item.image.stem for item in items]
+    unique = len(set(names)) == len(names)
+    return [
+        item._replace(name=name if unique else f"{i:05d}_{name}")
+        for i, (item, name) in enumerate(zip(items, names))
+    ]
+
+
+def contour_path(output: Path, item: Item) -> Path:
+    return output / (item.name + CONTOUR_SUFFIX)
+
+
+def save_contour(path: Path, contour: np.ndarray):
+    """Saves the contour atomically, so only complete files are found on reruns."""
+    temporary = path.with_name(path.name + ".tmp")
+    np.savetxt(temporary, contour)
+    os.replace(temporary, path)
+
+
+def segmented(output: Path, items: Sequence[Item], binary: bool = False) -> Set[str]:
+    """Names of the items whose contour is already saved in the output directory."""
+    if not binary:
+        return {item.name for item in items if contour_path(output, item).exists()}
+    if not (output / CONTOURS_FILE).exists():
+        return set()
+    contours = ContourFile(output / CONTOURS_FILE)
+    names = (contours.metadata(i).get("name") for i in range(len(contours)))
+    return {name for name in names if name is not None}
+
+
+def run(
+    items: Sequence[Item],
+    output: Path,
+    params: Dict,
+    workers: Optional[int] = None,
+    chunksize: int = 1,
+    overwrite: bool = False,
+    store: Optional[ResultStore] = None,
+    binary: bool = False,
+) -> List[BatchResult]:
+    """Segments the items whose contour is not in the output directory yet.
+
+    With a store, the results found in it are not segmented again. If binary, the
+    contours are appended to the CONTOURS_FILE of the output directory, rather than
+    saved as text files, and the last one with a name replaces any earlier ones.
+
+    Returns the results of the items segmented in this run, in completion order.
+    """
+    output.mkdir(parents=True, exist_ok=True)
+    saved = set() if overwrite else segmented(output, items, binary)
+    pending = [item for item in items if item.name not in saved]
+    skipped = len(items) - len(pending)
+    if skipped:
+        logger.info("Skipping %d images already segmented", skipped)
+
+    # Node files are small, so they are all read upfront, leaving out broken ones
+    jobs: List[Job] = []
+    failed = 0
+    for item in list(pending):
+        try:
+            jobs.append((item.image, np.loadtxt(item.nodes, ndmin=2), params))
+        except (OSError, ValueError) as err:
+            logger.error("%s: invalid node file %s: %s", item.name, item.nodes, err)
+            pending.remove(item)
+            failed += 1
+
+    if binary and pending:
+        writer: Optional[ContourWriter] = ContourWriter(output / CONTOURS_FILE)
+    else:
+        writer = None
+
+    results = []
+    start = perf_counter()
+    for done, result in enumerate(segment_many(jobs, workers, chunksize, store), 1):
+        item = pending[result.job]
+        if result.error is not None or result.contour is None:
+            failed += 1
+            logger.error(
+                "[%d/%d] %s failed after %.2f s: %s",
+                done,
+                len(pending),
+                item.name,
+                result.elapsed,
+                result.error,
+            )
+        elif writer is not None:
+            writer.append(
+                result.contour,
+                name=item.name,
+                image=str(item.image),
+                nodes=jobs[result.job][1],
+                params=params,
+                iterations=result.iterations,
+                converged=result.converged,
+            )
+        else:
+            save_contour(contour_path(output, item), result.contour)
+        if result.error is None:
+            timing = f"{result.elapsed:.2f} s" if result.elapsed else "stored"
+            logger.info("[%d/%d] %s: %s", done, len(pending), item.name, timing)
+        results.append(result)
+    if writer is not None:
+        writer.close()
+
+    elapsed = perf_counter() - start
+    if results:
+        logger.info(
+            "Segmented %d images (%d failed) in %.1f s: %.2f images/s",
+            len(results),
+            failed,
+            elapsed,
+            len(results) / elapsed,
+        )
+    return results
+
+
+def parse_args(args: Optional[Sequence[str]] = None) -> Namespace:
+    parser = ArgumentParser(
+        prog="python -m python_guis.cli",
+        description="Segments images starting from the nodes of an initial contour.",
+    )
+    parser.add_argument(
+        "input", type=Path, help="Directory with images and node files, or manifest."
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=Path("contours"),
+        help="Directory for the contours (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, help="Worker processes (default: all CPUs)."
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=1, help="Images sent to a worker at once."
+    )
+    parser.add_argument(
+        "--format",
+        choices=("text", "binary"),
+        default="text",
+        help=f"Text files per image or a single {CONTOURS_FILE} (default: text).",
+    )
+    parser.add_argument(
+        "--overwrite", action="store_true", help="Segment images already done."
+    )
+    parser.add_argument("--sigma", type=float, default=1)
+    parser.add_argument("--resolution", type=int, default=360)
+    parser.add_argument("--degree", type=int, default=3)
+    parser.add_argument("--alpha", type=float, default=0.001)
+    parser.add_argument("--beta", type=float, default=0.1)
+    parser.add_argument("--gamma", type=float, default=0.01)
+    parser.add_argument(
+        "--levels", type=int, default=1, help="Levels of the image pyramid."
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=RESULTS_PATH,
+        help="Result store shared with the GUIs (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Do not use the result store."
+    )
+    parser.add_argument(
+        "--precision",
+        choices=("float64", "float32"),
+        default=PRECISION.name,
+        help="Floating point type of the images (default: %(default)s).",
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only log errors.")
+    return parser.parse_args(args)
+
+
+def main(args: Optional[Sequence[str]] = None) -> int:
+    options = parse_args(args)
+    logging.basicConfig(
+        level=logging.ERROR if options.quiet else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+    if options.input.is_dir():
+        items = from_directory(options.input)
+    else:
+        items = from_manifest(options.input)
+    if not items:
+        logger.error("No images with node files found in %s", options.input)
+        return 1
+
+    params = dict(
+        sigma=options.sigma,
+        resolution=options.resolution,
+        degree=options.degree,
+        alpha=options.alpha,
+        beta=options.beta,
+        gamma=options.gamma,
+        levels=options.levels,
+        dtype=options.precision,
+    )
+    run(
+        items,
+        options.output,
+        params,
+        workers=options.workers,
+        chunksize=options.chunksize,
+        overwrite=options.overwrite,
+        store=None if options.no_cache else ResultStore(options.cache),
+        binary=options.format == "binary",
+    )
+    done = segmented(options.output, items, options.format == "binary")
+    return int(not all(item.name in done for item in items))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
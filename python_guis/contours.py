@@ -0,0 +1,177 @@
+"""Compact binary files holding many contours, written as they are segmented.
+
+A contour file starts with the 8 bytes of MAGIC and is followed by one record per
+contour, each made of:
+
+- A 16 bytes header: the record marker b"CTR1", the length of the metadata, the
+  number of points and the type of the coordinates - "f" for float32 and "d" for
+  float64 - padded with 3 zero bytes. Integers are little endian uint32.
+- The metadata, UTF-8 encoded JSON with anything worth keeping with the contour, eg.
+  the source image and the segmentation parameters, padded with spaces to a multiple
+  of 8 bytes.
+- The (points, 2) array of (x, y) coordinates, little endian.
+
+Records are only ever appended, so a file can grow while results come in. Reading it
+only needs the headers to find where each record is, and contours are read from a
+memory map of the file, so only those used are loaded. A record left incomplete by
+an interrupted write is ignored when reading and removed when appending again.
+"""
+import json
+from pathlib import Path
+import struct
+from typing import Dict, Iterator, List, NamedTuple, Tuple, Union
+
+import numpy as np
+
+MAGIC = b"PGCONT01"
+"""First bytes of a contour file, identifying the format and its version."""
+
+_HEADER = struct.Struct("<4sIIc3x")
+_MARKER = b"CTR1"
+_TYPES: Dict[bytes, np.dtype] = {b"f": np.dtype("<f4"), b"d": np.dtype("<f8")}
+_CODES = {dtype: code for code, dtype in _TYPES.items()}
+
+
+class Record(NamedTuple):
+    """Location of a contour and its metadata in the file."""
+
+    metadata_offset: int
+    metadata_length: int
+    offset: int
+    points: int
+    dtype: np.dtype
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.points * 2 * self.dtype.itemsize
+
+
+def _padded(length: int) -> int:
+    return -(-length // 8) * 8
+
+
+def _json_default(value):
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return str(value)
+
+
+def scan(path: Union[str, Path], start: int = len(MAGIC)) -> Tuple[List[Record], int]:
+    """Finds the complete records in the file, reading only their headers.
+
+    Returns the records and the end of the last complete one, where a new record can
+    be written. Anything after it, including an invalid header, is taken as an
+    incomplete record.
+    """
+    records: List[Record] = []
+    with Path(path).open("rb") as f:
+        if start == len(MAGIC) and f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a contour file.")
+
+        size = f.seek(0, 2)
+        end = start
+        while end + _HEADER.size <= size:
+            f.seek(end)
+            marker, length, points, code = _HEADER.unpack(f.read(_HEADER.size))
+            if marker != _MARKER or code not in _TYPES:
+                break
+            metadata = end + _HEADER.size
+            record = Record(
+                metadata, length, metadata + _padded(length), points, _TYPES[code]
+            )
+            if record.end > size:
+                break
+            records.append(record)
+            end = record.end
+    return records, end
+
+
+class ContourWriter:
+    """Appends contours to a file, creating it if needed.
+
+    Each contour is written and flushed to disk as soon as it is appended, so an
+    interrupted program loses, at most, the contour being written. That partial
+    record is removed when the file is opened for appending again.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            self.path.write_bytes(MAGIC)
+            self.count = 0
+        else:
+            records, end = scan(self.path)
+            self.count = len(records)
+            if end < self.path.stat().st_size:
+                with self.path.open("r+b") as f:
+                    f.truncate(end)
+        self._file = self.path.open("ab")
+
+    def append(self, contour: np.ndarray, **metadata) -> int:
+        """Adds the contour with its metadata, returning its position in the file.
+
+        Coordinates in float32 are kept as such and anything else stored as float64.
+        """
+        contour = np.asarray(contour)
+        dtype = _TYPES[b"f"] if contour.dtype == np.float32 else _TYPES[b"d"]
+        data = np.ascontiguousarray(contour, dtype=dtype).reshape(-1, 2)
+        text = json.dumps(metadata, default=_json_default).encode()
+        padding = b" " * (_padded(len(text)) - len(text))
+
+        header = _HEADER.pack(_MARKER, len(text), len(data), _CODES[dtype])
+        self._file.write(header + text + padding + data.tobytes())
+        self._file.flush()
+        self.count += 1
+        return self.count - 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "ContourWriter":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ContourFile:
+    """Read only access to the contours of a file, by position.
+
+    The contours are read only views of a memory map of the file. Call refresh to see
+    contours appended after opening it.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.records: List[Record] = []
+        self._end = len(MAGIC)
+        self._map = np.empty(0, dtype=np.uint8)
+        self.refresh()
+
+    def refresh(self):
+        """Finds the records added since the file was opened or last refreshed."""
+        records, self._end = scan(self.path, self._end)
+        self.records.extend(records)
+        if self._end > len(self._map):
+            self._map = np.memmap(self.path, dtype=np.uint8, mode="r", shape=self._end)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """The (points, 2) array of coordinates of a contour."""
+        record = self.records[index]
+        data = self._map[record.offset : record.end]  # noqa: E203
+        return data.view(record.dtype).reshape(record.points, 2)
+
+    def metadata(self, index: int) -> Dict:
+        """The metadata stored with a contour."""
+        record = self.records[index]
+        start = record.metadata_offset
+        text = self._map[start : start + record.metadata_length]  # noqa: E203
+        return json.loads(text.tobytes())
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, Dict]]:
+        """Iterates over the contours and their metadata."""
+        for i in range(len(self)):
+            yield self[i], self.metadata(i)
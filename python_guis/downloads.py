@@ -0,0 +1,124 @@
+"""Downloading files in the background, reporting progress and completion to a GUI.
+
+All downloads share a requests.Session, so connections to the same host are kept
+open and reused, and run in a bounded pool of threads, so clicking many times does
+not start an unlimited number of them. Files are streamed to disk in chunks, rather
+than held in memory, and only appear under their final name once complete.
+
+Progress and completion are handed to the main loop of the GUI by a dispatcher - see
+python_guis.jobs - which wakes it up only when there is something to show. Progress
+is reported at most max_rate times per second for each download, however small the
+chunks, so it does not flood the main loop:
+
+    downloads = DownloadManager(tk_dispatcher(root), directory="pictures")
+    downloads.submit(url, on_progress=update_bar, on_done=show_picture)
+"""
+import os
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Optional, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from python_guis.jobs import Dispatcher, JobRunner
+
+Progress = Callable[[int, Optional[int]], None]
+"""Called with the bytes downloaded so far and the total, if known."""
+
+
+class DownloadManager:
+    """Downloads files with at most workers at the same time.
+
+    Files are saved in directory, by default the current one, and given the last part
+    of their URL as name, unless a filename is given. Progress is reported at most
+    max_rate times per second for each download, and always once it is complete.
+    """
+
+    def __init__(
+        self,
+        dispatch: Dispatcher,
+        directory: Union[str, Path] = ".",
+        workers: int = 4,
+        chunk_size: int = 64 * 2**10,
+        timeout: float = 30,
+        session: Optional[requests.Session] = None,
+        max_rate: float = 30,
+    ):
+        self.directory = Path(directory)
+        self.max_rate = max_rate
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.runner = JobRunner(dispatch, max_workers=workers)
+
+    def submit(
+        self,
+        url: str,
+        filename: Optional[str] = None,
+        on_progress: Optional[Progress] = None,
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        process: Optional[Callable[[Path], Any]] = None,
+    ):
+        """Starts downloading the url, returning a future with the path of the file.
+
+        If given, process is called with the path in the download thread once the file
+        is complete, eg. to decode it, and the future has its result instead.
+
+        The callbacks are called from the main loop: on_progress as chunks are written,
+        and then either on_done with the result or on_error.
+        """
+        path = self.directory / (filename or Path(urlparse(url).path).name)
+        progress = None if on_progress is None else self.runner.main_loop(on_progress)
+        return self.runner.submit(
+            self._fetch,
+            url,
+            path,
+            progress,
+            process,
+            on_done=on_done,
+            on_error=on_error,
+        )
+
+    def _fetch(self, url: str, path: Path, progress, process):
+        path = self.download(url, path, progress)
+        return path if process is None else process(path)
+
+    def download(
+        self, url: str, path: Path, progress: Optional[Progress] = None
+    ) -> Path:
+        """Downloads the url to path in the calling thread, returning the path."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + ".part")
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                length = response.headers.get("Content-Length")
+                total = int(length) if length else None
+                done, reported = 0, 0.0
+                with temporary.open("wb") as f:
+                    for chunk in response.iter_content(self.chunk_size):
+                        f.write(chunk)
+                        done += len(chunk)
+                        now = perf_counter()
+                        if progress is not None and now - reported >= 1 / self.max_rate:
+                            progress(done, total)
+                            reported = now
+                if progress is not None:
+                    progress(done, total)
+        except BaseException:
+            if temporary.exists():
+                temporary.unlink()
+            raise
+        os.replace(temporary, path)
+        return path
+
+    def shutdown(self):
+        """Stops accepting downloads and closes the connections."""
+        self.runner.shutdown()
+        self.session.close()
@@ -0,0 +1,306 @@
+"""Greyscale images stored on disk and memory mapped, for inputs too large for RAM.
+
+The first time a large image is opened, it is decoded, converted to greyscale and
+saved as a .npy file in a cache directory, together with a pyramid of copies
+downscaled by 2, 4, 8... Greyscale .npy inputs are used directly, with no need to
+decode them in full. Later on, those files are memory mapped, so only the parts of
+the image that are actually used are read from disk: a downscaled level small enough
+for the screen to display it and the region around the contour to segment it.
+
+Images small enough to fit in memory are never written to disk. The cache directory
+is bounded in size, removing the least recently used images first.
+"""
+from contextlib import contextmanager
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from python_guis.model import PRECISION, Segmentation, as_float, float_type, segment
+from python_guis.results import ResultStore, file_key, result_key
+
+CACHE_DIR = Path.home() / ".cache" / "python_guis" / "images"
+"""Default directory for the converted images."""
+
+CACHE_MAX_BYTES = 4 * 2**30
+"""Default size limit of the converted images in the cache directory."""
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".npy")
+"""Suffixes of the image files that can be opened."""
+
+ROWS_PER_BLOCK = 1024
+"""Rows processed at once when converting images, bounding the memory used."""
+
+
+@contextmanager
+def _replacing(path: Path) -> Iterator[Path]:
+    """Temporary file that replaces path at the end, unless there is an error.
+
+    Its name is unique, so several processes converting the same image at once do
+    not write to the same file, and an interrupted conversion is not used later.
+    """
+    handle, name = tempfile.mkstemp(suffix=".tmp.npy", dir=str(path.parent))
+    os.close(handle)
+    temporary = Path(name)
+    try:
+        yield temporary
+        os.replace(str(temporary), str(path))
+    except BaseException:
+        if temporary.exists():
+            temporary.unlink()
+        raise
+
+
+def _greyscale(image: np.ndarray, dtype) -> np.ndarray:
+    """The decoded image or rows of it as with imread(as_gray=True) and as_float."""
+    if image.ndim > 2:
+        from skimage.color import rgb2gray, rgba2rgb
+
+        if image.shape[2] == 4:
+            image = rgba2rgb(image)
+        image = rgb2gray(image)
+    return as_float(image, dtype)
+
+
+def _convert(image: np.ndarray, path: Path, dtype):
+    """Saves the decoded image in greyscale and dtype, converting blocks of rows.
+
+    Only the decoded image - eg. 3 bytes per pixel for 8 bit colour - is held in
+    memory in full, rather than its floating point and greyscale copies, too.
+    """
+    rows, cols = image.shape[:2]
+    with _replacing(path) as temporary:
+        target = np.lib.format.open_memmap(
+            str(temporary), mode="w+", dtype=dtype, shape=(rows, cols)
+        )
+        for start in range(0, rows, ROWS_PER_BLOCK):
+            stop = min(start + ROWS_PER_BLOCK, rows)
+            target[start:stop] = _greyscale(image[start:stop], dtype)
+        target.flush()
+        del target
+
+
+def _halve(block: np.ndarray) -> np.ndarray:
+    """Averages blocks of 2x2 pixels, dropping the last row or column if odd."""
+    rows, cols = block.shape[0] // 2, block.shape[1] // 2
+    block = np.asarray(block[: 2 * rows, : 2 * cols])
+    return block.reshape(rows, 2, cols, 2).mean(axis=(1, 3)).astype(block.dtype)
+
+
+def _downscale(source: np.ndarray, path: Path):
+    """Saves a copy of the source with half the size, averaging blocks of 2x2 pixels.
+
+    The source is read in blocks of rows, so it can be a memory mapped array.
+    """
+    rows, cols = source.shape[0] // 2, source.shape[1] // 2
+    with _replacing(path) as temporary:
+        target = np.lib.format.open_memmap(
+            str(temporary), mode="w+", dtype=source.dtype, shape=(rows, cols)
+        )
+        for start in range(0, rows, ROWS_PER_BLOCK // 2):
+            stop = min(start + ROWS_PER_BLOCK // 2, rows)
+            first, last = 2 * start, 2 * stop
+            target[start:stop] = _halve(source[first:last])
+        target.flush()
+        del target
+
+
+def _evict(cache_dir: Path, max_bytes: int, keep: Path):
+    """Removes the least recently used images until the cache is below max_bytes."""
+    images = []
+    for directory in cache_dir.iterdir():
+        try:
+            size = sum(f.stat().st_size for f in directory.iterdir())
+            images.append((directory.stat().st_mtime, size, directory))
+        except OSError:
+            # Not a directory, or removed by another process in the meantime
+            continue
+
+    total = sum(size for _, size, _ in images)
+    for _, size, directory in sorted(images):
+        if total <= max_bytes:
+            break
+        if directory != keep:
+            shutil.rmtree(str(directory), ignore_errors=True)
+            total -= size
+
+
+class ImageSource:
+    """A greyscale image and its pyramid of downscaled levels, memory mapped.
+
+    Level 0 is the full resolution image, and each level halves the size of the
+    previous one, until the largest side is below min_size. Images with fewer than
+    in_memory pixels are small enough to be loaded into memory as usual, together
+    with their pyramid, without using the cache directory.
+
+    The levels are stored as dtype, by default model.PRECISION, so float32 halves the
+    memory and disk used. Greyscale .npy inputs keep their own type. The converted
+    images in the cache directory are limited to max_cache_bytes, by default
+    CACHE_MAX_BYTES, and those not used for longest are removed first.
+
+    The content_key identifies the file and its results in a store - see file_key.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        cache_dir: Optional[Path] = None,
+        min_size: int = 512,
+        in_memory: int = 2**24,
+        dtype=None,
+        max_cache_bytes: Optional[int] = None,
+    ):
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype or PRECISION)
+        self.content_key = file_key(self.path, self.dtype)
+        self.cache_dir = Path(cache_dir or CACHE_DIR)
+        self.directory = self.cache_dir / self.content_key
+        self.max_cache_bytes = (
+            CACHE_MAX_BYTES if max_cache_bytes is None else max_cache_bytes
+        )
+
+        self.levels: List[np.ndarray] = [self._full_resolution(in_memory)]
+        while max(self.levels[-1].shape) > min_size:
+            self.levels.append(self._open(len(self.levels)))
+
+        if self.directory.exists():
+            # Marks the image as recently used and makes room for it, if new
+            os.utime(str(self.directory))
+            _evict(self.cache_dir, self.max_cache_bytes, keep=self.directory)
+
+    def _full_resolution(self, in_memory: int) -> np.ndarray:
+        """Loads the full resolution image, or maps it if larger than in_memory."""
+        if self.path.suffix == ".npy":
+            image = np.load(self.path, mmap_mode="r")
+            return np.array(image) if image.size <= in_memory else image
+
+        path = self.directory / "level0.npy"
+        if path.exists():
+            return np.load(path, mmap_mode="r")
+
+        from skimage.io import imread
+
+        decoded = imread(self.path)
+        if decoded.shape[0] * decoded.shape[1] <= in_memory:
+            return _greyscale(decoded, self.dtype)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _convert(decoded, path, self.dtype)
+        del decoded
+        return np.load(path, mmap_mode="r")
+
+    def _open(self, level: int) -> np.ndarray:
+        """Downscales the previous level, in memory or memory mapped like level 0."""
+        if self.in_memory:
+            return _halve(self.levels[level - 1])
+
+        path = self.directory / f"level{level}.npy"
+        if not path.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            _downscale(self.levels[level - 1], path)
+        return np.load(path, mmap_mode="r")
+
+    @property
+    def data(self) -> np.ndarray:
+        """The full resolution image."""
+        return self.levels[0]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.levels[0].shape
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the full resolution image, whether in memory or mapped."""
+        return self.levels[0].nbytes
+
+    def describe(self) -> str:
+        """Short description of the image and the memory it uses."""
+        rows, cols = self.shape
+        where = "in memory" if self.in_memory else "memory mapped"
+        return (
+            f"{self.path.name} {cols}x{rows} {self.levels[0].dtype}, "
+            f"{self.nbytes / 2**20:.1f} MB {where}"
+        )
+
+    @property
+    def in_memory(self) -> bool:
+        """If the full resolution image is loaded in memory, rather than mapped."""
+        return not isinstance(self.levels[0], np.memmap)
+
+    def display(self, max_pixels: int = 2**22) -> Tuple[np.ndarray, Tuple]:
+        """The finest level with at most max_pixels and its extent for imshow.
+
+        The extent is that of the full resolution image, so coordinates in the plot
+        are always full resolution pixels.
+        """
+        level = next((lvl for lvl in self.levels if lvl.size <= max_pixels), None)
+        level = self.levels[-1] if level is None else level
+        rows, cols = self.shape
+        return np.asarray(level), (-0.5, cols - 0.5, rows - 0.5, -0.5)
+
+    def region(
+        self, nodes, margin: float = 0.5, halo: float = 0
+    ) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Full resolution region around the nodes and the (row, column) of its corner.
+
+        The bounding box of the nodes is expanded by margin times its size, so the
+        contour has room to move, and by halo pixels, eg. for the filter.
+        """
+        xy = np.asarray(nodes, dtype=float)
+        low, high = xy.min(axis=0), xy.max(axis=0)
+        pad = margin * (high - low) + halo
+        col0, row0 = np.maximum(np.floor(low - pad).astype(int), 0)
+        col1, row1 = np.minimum(np.ceil(high + pad).astype(int) + 1, self.shape[::-1])
+        return np.asarray(self.levels[0][row0:row1, col0:col1]), (row0, col0)
+
+
+def segment_source(
+    source: ImageSource,
+    nodes,
+    sigma=1,
+    margin: float = 0.5,
+    store: Optional[ResultStore] = None,
+    **kwargs,
+) -> Segmentation:
+    """Segments the image of the source starting from a spline through the nodes.
+
+    Images in memory are segmented whole. For memory mapped ones, only the region
+    around the nodes is read and segmented - see ImageSource.region. With a store,
+    results segmented before are returned from it, and new ones saved to it. The
+    rest of the arguments are those of model.segment.
+    """
+    if store is not None:
+        params = dict(kwargs, sigma=sigma)
+        params["dtype"] = float_type(source.data.dtype, kwargs.get("dtype"))
+        if not source.in_memory:
+            # Only the region around the nodes is segmented, so its margin matters
+            params["margin"] = margin
+        key = result_key(source.content_key, nodes, params)
+        result = store.get(key)
+        if result is None:
+            result = segment_source(source, nodes, sigma, margin, **kwargs)
+            store.put(key, result)
+        return result
+
+    if source.in_memory:
+        return segment(source.data, nodes, sigma=sigma, **kwargs)
+
+    image, (row, col) = source.region(nodes, margin=margin, halo=4 * sigma)
+    shift = np.array([col, row])
+    previous = kwargs.get("previous")
+    if previous is not None:
+        kwargs["previous"] = previous._replace(
+            contour=previous.contour - shift, initial=previous.initial - shift
+        )
+    result = segment(image, np.asarray(nodes) - shift, sigma=sigma, **kwargs)
+    if previous is not None and result is kwargs["previous"]:
+        # Nothing changed, so the previous result is returned as it was
+        return previous
+    return result._replace(
+        contour=result.contour + shift.astype(result.contour.dtype),
+        initial=result.initial + shift,
+    )
@@ -0,0 +1,278 @@
+"""Running long computations in the background, away from the GUI main loop.
+
+Widgets can only be updated from the main loop of their toolkit, so the results of
+the background jobs are handed back to it by a dispatcher: a function taking a
+callable that arranges for it to be called from the main loop. There is one
+dispatcher for each of the toolkits used in the examples. Similarly, a scheduler
+calls a callable from the main loop after a delay, using the timers of the toolkit.
+"""
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+from threading import Event, Lock
+from typing import Callable, Optional
+
+Dispatcher = Callable[[Callable[[], None]], None]
+
+Scheduler = Callable[[float, Callable[[], None]], Callable[[], None]]
+"""Calls a callable from the main loop after a delay in seconds.
+
+Must be called from the main loop. Returns a function that cancels the call.
+"""
+
+
+def tk_dispatcher(widget) -> Dispatcher:
+    """Calls the callables from the Tk main loop of the widget.
+
+    Tk is not thread safe, so the callables are queued and the main loop is woken up
+    with a virtual event, which tkinter passes on to the main thread, to empty the
+    queue. There is a single event for all the callables queued until it is handled,
+    and nothing runs while there is nothing to call.
+    """
+    from tkinter import TclError
+
+    pending: SimpleQueue = SimpleQueue()
+    lock = Lock()
+    woken = [False]
+    event = f"<<Dispatch{id(pending)}>>"
+
+    def run(*args):
+        with lock:
+            woken[0] = False
+        while True:
+            try:
+                pending.get_nowait()()
+            except Empty:
+                break
+
+    def dispatch(fn: Callable[[], None]):
+        pending.put(fn)
+        with lock:
+            if woken[0]:
+                return
+            woken[0] = True
+        try:
+            widget.event_generate(event, when="tail")
+        except (RuntimeError, TclError):
+            # The main loop has finished or the widget has been destroyed
+            pass
+
+    widget.bind(event, run, add="+")
+    return dispatch
+
+
+def qt_dispatcher() -> Dispatcher:
+    """Calls the callables from the Qt main loop.
+
+    It must be created from the main thread, as the signal used to pass the callables
+    is delivered to the thread the relay object lives in.
+    """
+    from PySide2.QtCore import QObject, Signal, Slot
+
+    class Relay(QObject):
+        call = Signal(object)
+
+        def __init__(self):
+            super().__init__()
+            self.call.connect(self.run)
+
+        @Slot(object)
+        def run(self, fn):
+            fn()
+
+    relay = Relay()
+    return lambda fn: relay.call.emit(fn)
+
+
+def tk_scheduler(widget) -> Scheduler:
+    """Schedules the callables with `after` in the Tk main loop of the widget."""
+
+    def schedule(delay: float, fn: Callable[[], None]) -> Callable[[], None]:
+        handle = widget.after(int(delay * 1000), fn)
+        return lambda: widget.after_cancel(handle)
+
+    return schedule
+
+
+def qt_scheduler() -> Scheduler:
+    """Schedules the callables with single shot QTimers."""
+    from PySide2.QtCore import QTimer
+
+    def schedule(delay: float, fn: Callable[[], None]) -> Callable[[], None]:
+        # The timer lives as long as the function cancelling it is referenced
+        timer = QTimer()
+        timer.setSingleShot(True)
+        timer.timeout.connect(fn)
+        timer.start(int(delay * 1000))
+        return timer.stop
+
+    return schedule
+
+
+def kivy_scheduler() -> Scheduler:
+    """Schedules the callables with the Kivy clock."""
+    from kivy.clock import Clock
+
+    return lambda delay, fn: Clock.schedule_once(lambda dt: fn(), delay).cancel
+
+
+def asyncio_scheduler(loop=None) -> Scheduler:
+    """Schedules the callables in an asyncio event loop."""
+    import asyncio
+
+    loop = loop or asyncio.get_event_loop()
+    return lambda delay, fn: loop.call_later(delay, fn).cancel
+
+
+def kivy_dispatcher() -> Dispatcher:
+    """Calls the callables in the next frame of the Kivy clock."""
+    from kivy.clock import Clock
+
+    return lambda fn: Clock.schedule_once(lambda dt: fn(), 0)
+
+
+def asyncio_dispatcher(loop=None) -> Dispatcher:
+    """Calls the callables from an asyncio event loop, eg. that of IPython kernels."""
+    import asyncio
+
+    loop = loop or asyncio.get_event_loop()
+    return loop.call_soon_threadsafe
+
+
+class JobRunner:
+    """Runs jobs in an executor and calls back in the main loop when they finish.
+
+    By default, jobs run one at a time in a background thread.
+    """
+
+    def __init__(
+        self,
+        dispatch: Dispatcher,
+        executor: Optional[Executor] = None,
+        max_workers: int = 1,
+    ):
+        self.dispatch = dispatch
+        self.executor = executor or ThreadPoolExecutor(max_workers)
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        on_done: Optional[Callable] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        **kwargs,
+    ) -> Future:
+        """Submits fn(*args, **kwargs) to the executor.
+
+        When it finishes, on_done is called from the main loop with its result or, if
+        it failed, on_error with the exception. Without on_error, the exception is
+        raised in the main loop, so the toolkit reports it as any other error in a
+        callback. Cancelled jobs call neither.
+        """
+        future = self.executor.submit(fn, *args, **kwargs)
+
+        def finished(future: Future):
+            if future.cancelled():
+                return
+
+            error = future.exception()
+            if error is None:
+                if on_done is not None:
+                    self.dispatch(lambda: on_done(future.result()))
+            elif on_error is not None:
+                self.dispatch(lambda: on_error(error))
+            else:
+                self.dispatch(lambda: _reraise(error))
+
+        future.add_done_callback(finished)
+        return future
+
+    def main_loop(self, fn: Callable) -> Callable:
+        """Wraps fn so calling it from any thread calls it from the main loop."""
+        return lambda *args, **kwargs: self.dispatch(lambda: fn(*args, **kwargs))
+
+    def shutdown(self, wait: bool = False):
+        """Stops accepting jobs, optionally waiting for those already submitted."""
+        self.executor.shutdown(wait=wait)
+
+
+class LivePreview:
+    """Re-runs a job every time its arguments change, keeping only the latest run.
+
+    Updates closer in time than delay seconds are coalesced, so only the last set of
+    arguments is computed, eg. while dragging a slider. The delay is timed by the
+    scheduler of the toolkit, so the preview must be used from its main loop. The job
+    must accept a cancel keyword argument, a threading.Event that is set when a newer
+    run starts so the job can stop early. Results and errors of obsolete runs are
+    discarded.
+    """
+
+    def __init__(
+        self,
+        runner: JobRunner,
+        schedule: Scheduler,
+        fn: Callable,
+        on_done: Callable,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        delay: float = 0.3,
+    ):
+        self.runner = runner
+        self.schedule = schedule
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.delay = delay
+        self._generation = 0
+        self._unschedule: Optional[Callable[[], None]] = None
+        self._cancel = Event()
+        self._future: Optional[Future] = None
+
+    def update(self, *args, **kwargs):
+        """Schedules a run with these arguments, superseding any previous one."""
+        generation = self._stop()
+        self._unschedule = self.schedule(
+            self.delay, lambda: self._start(generation, args, kwargs)
+        )
+
+    def stop(self):
+        """Cancels the scheduled and running jobs."""
+        self._stop()
+
+    def _stop(self) -> int:
+        self._generation += 1
+        if self._unschedule is not None:
+            self._unschedule()
+            self._unschedule = None
+        if self._future is not None:
+            self._future.cancel()
+        self._cancel.set()
+        return self._generation
+
+    def _start(self, generation: int, args, kwargs):
+        self._unschedule = None
+        if generation != self._generation:
+            return
+
+        self._cancel = Event()
+        self._future = self.runner.submit(
+            self.fn,
+            *args,
+            cancel=self._cancel,
+            on_done=lambda result: self._done(generation, result),
+            on_error=lambda error: self._failed(generation, error),
+            **kwargs,
+        )
+
+    def _done(self, generation: int, result):
+        if generation == self._generation:
+            self.on_done(result)
+
+    def _failed(self, generation: int, error: BaseException):
+        if generation != self._generation:
+            return
+        if self.on_error is None:
+            raise error
+        self.on_error(error)
+
+
+def _reraise(error: BaseException):
+    raise error
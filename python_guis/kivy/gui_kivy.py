@@ -3,12 +3,15 @@ from pathlib import Path
 from kivy.app import App
 from kivy.config import Config
 from kivy.garden.matplotlib.backend_kivyagg import FigureCanvasKivyAgg
+from kivy.graphics import Color, Line, Point
 from kivy.properties import ListProperty, NumericProperty, ObjectProperty
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.stacklayout import StackLayout
-from matplotlib.pyplot import Figure
+from matplotlib.figure import Figure
 import numpy as np
 
+from python_guis import timing
+
 Config.set("input", "mouse", "mouse,multitouch_on_demand")
 Config.set("graphics", "width", "800")
 Config.set("graphics", "height", "600")
@@ -20,16 +23,41 @@ class Matplotlib(FigureCanvasKivyAgg):
     initial = ObjectProperty(None, allownone=True, force_dispatch=True)
     controls = ObjectProperty(None)
     diameter = 30.0
+    runner = None
 
     def __init__(self, **kwargs):
         from skimage.io import imread
         from python_guis import INSECTS
+        from python_guis.model import PRECISION, as_float
 
         self.figure = Figure(tight_layout=True)
+        self.figure.patch.set_visible(False)
+        self.image_path = INSECTS
+        self.image_data = as_float(imread(INSECTS, as_gray=True), PRECISION)
+
+        # Matplotlib only renders the image, which is needed only when the widget is
+        # resized. Nodes and contours are drawn on top as Kivy instructions, so
+        # updating them does not depend on the size of the image.
+        self.axes = self.figure.add_subplot()
+        self.axes.imshow(self.image_data, cmap="binary_r")
+        self.axes.set_title(
+            "Left click to add a control node.\n"
+            "At least 3 are needed to perform a segmentation."
+        )
+        self.axes.get_xaxis().set_visible(False)
+        self.axes.get_yaxis().set_visible(False)
+        self.lines = {}
 
         super().__init__(self.figure, **kwargs)
-        self.figure.patch.set_visible(False)
-        self.image_data = imread(INSECTS, as_gray=True)
+
+        with self.canvas.after:
+            Color(1, 0, 0)
+            self.lines["nodes"] = Line(width=1.1)
+            self.lines["markers"] = Point(pointsize=3)
+            Color(0, 0, 1)
+            self.lines["initial"] = Line(width=1.1)
+            Color(1, 0.65, 0)
+            self.lines["contour"] = Line(width=1.1)
 
         def add_control_point(event):
             if self.contour is not None:
@@ -39,25 +67,17 @@ class Matplotlib(FigureCanvasKivyAgg):
                 self.control_points.append((event.xdata, event.ydata))
 
         self.bind(
-            control_points=lambda *args: self.draw(), contour=lambda *args: self.draw()
+            control_points=lambda *args: self.update_lines(),
+            contour=lambda *args: self.update_lines(),
         )
         self.mpl_connect("button_release_event", add_control_point)
 
+    @timing.timed("draw")
     def draw(self):
-        from matplotlib import pyplot as plt
-
-        self.figure.clear()
-        axes = self.figure.add_subplot()
-        axes.imshow(self.image_data, cmap=plt.get_cmap("binary_r"))
-        axes.set_title(
-            "Left click to add a control node.\n"
-            "At least 3 are needed to perform a segmentation."
-        )
-        axes.get_xaxis().set_visible(False)
-        axes.get_yaxis().set_visible(False)
-        self.draw_control_points(axes)
-        self.draw_contour(axes)
-        return super().draw()
+        """Renders the image and places the lines on top of it."""
+        result = super().draw()
+        self.update_lines()
+        return result
 
     def remove_all(self):
         """Removes all control points and segments."""
@@ -65,27 +85,34 @@ class Matplotlib(FigureCanvasKivyAgg):
         self.contour = None
         self.control_points = []
 
-    def draw_control_points(self, axes):
-        if len(self.control_points) == 0:
-            return
-
-        xy = np.array(self.control_points + [self.control_points[0]])
-        axes.plot(*xy.T, "ro-")
+    def to_widget(self, xy) -> list:
+        """Flat list of widget coordinates of the given data coordinates."""
+        if xy is None or len(xy) == 0:
+            return []
+        return (
+            (self.axes.transData.transform(np.asarray(xy)) + self.pos).ravel().tolist()
+        )
 
-    def draw_contour(self, axes):
-        if self.contour is None:
+    def update_lines(self):
+        """Updates the points of the nodes and contours lines."""
+        if not self.lines:
             return
 
-        axes.plot(*self.initial.T, color="blue", label="Initial")
-        axes.plot(*self.contour.T, color="orange", label="Segmented")
+        nodes = list(self.control_points)
+        self.lines["nodes"].points = self.to_widget(nodes + nodes[:1])
+        self.lines["markers"].points = self.to_widget(nodes)
+        self.lines["initial"].points = self.to_widget(self.initial)
+        self.lines["contour"].points = self.to_widget(self.contour)
 
-    def on_segment(self, degree, resolution, sigma):
-        from python_guis.model import segment_one_image
+    def on_segment(self, degree, resolution, sigma, levels=1):
+        from python_guis.jobs import JobRunner, kivy_dispatcher
+        from python_guis.results import file_key, segment_cached
         from kivy.clock import Clock
 
         degree = int(degree)
         resolution = int(getattr(resolution, "text", resolution))
         sigma = int(getattr(sigma, "value", sigma))
+        levels = int(levels)
 
         self.controls.disabled = True
         self.disabled = True
@@ -101,32 +128,38 @@ class Matplotlib(FigureCanvasKivyAgg):
             self.controls.disabled = False
             self.disabled = False
 
-        def computation(*args):
-            """Performs contour computations.
+        def show(result):
+            """Shows the contours once computed in the background."""
+            self.initial = result.initial
+            self.contour = result.contour
+            Clock.schedule_once(reenable, 0)
 
-            Computations are started in the next frame, *after* disabling the fields
-            becomes visible.
+        def failed(error):
+            """Logs the error, leaving the control points to try again."""
+            from kivy.logger import Logger
 
-            Note: async/await has landed in kivy dev. Eventually, computations should be
-            performed asynchronously, rather than through a chain of calls to
-            schedule_once.
-            """
-            contour, initial = segment_one_image(
-                nodes=self.control_points,
-                image=self.image_data,
-                degree=degree,
-                resolution=resolution,
-                sigma=sigma,
-            )
-            self.initial = initial
-            self.contour = contour
+            Logger.error(f"Segmentation: {error}")
             Clock.schedule_once(reenable, 0)
 
-        Clock.schedule_once(computation, 0)
+        if self.runner is None:
+            self.runner = JobRunner(kivy_dispatcher())
+        self.runner.submit(
+            segment_cached,
+            nodes=list(self.control_points),
+            image=self.image_data,
+            key=file_key(self.image_path, self.image_data.dtype),
+            degree=degree,
+            resolution=resolution,
+            sigma=sigma,
+            levels=levels,
+            on_done=show,
+            on_error=failed,
+        )
 
 
 class Controls(StackLayout):
     degree = NumericProperty(1)
+    levels = NumericProperty(1)
 
     def on_resolution_change(self, textinput):
         try:
@@ -143,6 +176,11 @@ class BeetleApp(App):
     def build(self):
         return MainWindow()
 
+    def on_start(self):
+        from python_guis.startup import prewarm
+
+        prewarm()
+
 
 if __name__ == "__main__":
     from python_guis.kivy.gui_kivy import BeetleApp  # noqa
@@ -1,30 +1,654 @@
-from typing import List
+"""Segmentation of images with active contours, shared by all the frontends.
 
+scikit-image and scipy.interpolate take a while to import, so they are imported the
+first time they are needed rather than here, keeping the start up of the GUIs fast.
+See python_guis.startup to import them in the background in advance.
+"""
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import islice
+import json
+from numbers import Real
+import os
+from threading import Event
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from matplotlib.backend_bases import FigureCanvasBase
 import numpy as np
-from scipy import interpolate
 
-from skimage.filters import gaussian
-from skimage.segmentation import active_contour
+from python_guis import timing
+from python_guis.cache import ArrayCache, image_key
+from python_guis.splines import bispline, derivative, splines
+
+filter_cache: ArrayCache[np.ndarray] = ArrayCache()
+gradient_cache: ArrayCache["EnergyGradient"] = ArrayCache()
+
+PRECISION = np.dtype(os.environ.get("PYTHON_GUIS_PRECISION", "float64"))
+"""Floating point type of the images loaded and segmented, float64 or float32.
+
+Images already in floating point keep their type unless another one is requested, so
+loading them in float32 is enough to segment them in float32.
+"""
+
+FILTER_THREADS = int(os.environ.get("PYTHON_GUIS_FILTER_THREADS", 0)) or os.cpu_count()
+"""Number of threads filtering large images, by default one for each core.
+
+Set it to 1, or the environment variable PYTHON_GUIS_FILTER_THREADS, to filter them
+in the calling thread only.
+"""
+
+# Smallest number of rows filtered by each thread, below which the threads cost more
+# than they save
+MIN_BAND_ROWS = 64
+
+# Name of the maximum number of iterations argument of snake_contour, as in the
+# active_contour of scikit-image >= 0.19
+MAX_ITERATIONS = "max_num_iter"
+
+
+class NodeOverlay:
+    """Draws the line of nodes on top of a cached rendering of the axes.
+
+    The line is animated, so it is left out of the normal drawing of the figure. Every
+    time the figure is fully drawn - eg. after a resize or a zoom - the rendered axes
+    are stored as background and the line drawn on top. Updating the nodes then only
+    needs restoring that background and blitting the line, instead of rendering the
+    whole image again. Canvases that can not blit are fully redrawn.
+
+    Optionally, the spline through the nodes is drawn in the same way.
+    """
+
+    def __init__(self, axes, canvas):
+        self.axes = axes
+        self.canvas = canvas
+        self.line = None
+        self.curve = None
+        self.background = None
+        blit = getattr(canvas, "supports_blit", None)
+        if blit is None:
+            blit = type(canvas).blit is not FigureCanvasBase.blit
+        self.supports_blit = blit
+        canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        """Stores the freshly drawn axes as background and draws the line on top."""
+        if self.supports_blit:
+            self.background = self.canvas.copy_from_bbox(self.axes.bbox)
+        for line in (self.curve, self.line):
+            if line in self.axes.lines:
+                self.axes.draw_artist(line)
+
+    def update(self, nodes, curve: Optional[np.ndarray] = None):
+        """Updates the line with the given nodes, closing the polygon, and the curve."""
+        xy = np.array(list(nodes) + list(nodes[:1])).reshape(-1, 2).T
+        if self.line not in self.axes.lines:
+            # The axes lines have been cleared, so the background is outdated, too
+            (self.curve,) = self.axes.plot([], [], ":", color="blue", animated=True)
+            (self.line,) = self.axes.plot(*xy, "ro-", label="Nodes", animated=True)
+            self.background = None
+        else:
+            self.line.set_data(*xy)
+        self.curve.set_data(*np.reshape([] if curve is None else curve, (-1, 2)).T)
+
+        if self.background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.axes.draw_artist(self.curve)
+            self.axes.draw_artist(self.line)
+            self.canvas.blit(self.axes.bbox)
+
+
+def node_overlay(axes, canvas) -> NodeOverlay:
+    """Returns the node overlay of the axes, creating it if needed.
 
+    It is kept as an attribute of the axes, so it is released together with them.
+    """
+    overlay = getattr(axes, "_node_overlay", None)
+    if overlay is None:
+        overlay = axes._node_overlay = NodeOverlay(axes, canvas)
+    return overlay
 
+
+@timing.timed()
 def add_node(event, nodes, canvas):
     if event.inaxes is not None:
         nodes.append((event.xdata, event.ydata))
-        if len(event.inaxes.lines) > 0:
-            event.inaxes.lines[0].set_data(np.array(nodes + [nodes[0]]).T)
-        else:
-            event.inaxes.plot(event.xdata, event.ydata, "ro-", label="Nodes")
-        canvas.draw()
+        node_overlay(event.inaxes, canvas).update(nodes)
+
 
+def spline(nodes: np.ndarray, resolution=360, degree=3, uniform=False) -> np.ndarray:
+    """Returns a spline that passes through the given points.
+
+    With uniform=True, the nodes are equally spaced in the spline parameter instead of
+    by their distance, so the evaluation basis is reused between calls. For many
+    contours at once, use python_guis.splines.splines.
+    """
+    if uniform:
+        return splines(nodes, resolution, degree, uniform=True)
 
-def spline(nodes: np.ndarray, resolution=360, degree=3) -> np.ndarray:
-    """Returns a spline that passes through the given points."""
     data = np.vstack((nodes, nodes[0]))
+    from scipy import interpolate
+
     tck, u = interpolate.splprep([data[:, 0], data[:, 1]], s=0, per=True, k=degree)[:2]
     return np.array(interpolate.splev(np.linspace(0, 1, resolution), tck)).T
 
 
-def segment_one_image(
+def as_float(image: np.ndarray, dtype=None) -> np.ndarray:
+    """The image in floating point, only copying it if needed.
+
+    Integer images are scaled to the [0, 1] range, as with skimage.img_as_float, and
+    converted to PRECISION, unless another dtype is given. Floating point images are
+    kept as they are, unless a different dtype is given. float16 becomes float32.
+    """
+    image = np.asarray(image)
+    dtype = float_type(image.dtype, dtype)
+    if image.dtype.kind in "ui":
+        from skimage.util import img_as_float
+
+        return img_as_float(image).astype(dtype, copy=False)
+    return image.astype(dtype, copy=False)
+
+
+def float_type(image_dtype, dtype=None) -> np.dtype:
+    """Floating point type of images of image_dtype after as_float(image, dtype)."""
+    image_dtype = np.dtype(image_dtype)
+    if image_dtype.kind in "ui":
+        return np.dtype(dtype or PRECISION)
+
+    dtype = np.dtype(dtype or image_dtype)
+    return np.dtype(np.float32) if dtype == np.float16 else dtype
+
+
+def filtered_image(
+    image: np.ndarray, sigma: float, threads: Optional[int] = None
+) -> np.ndarray:
+    """Returns the image after a gaussian filter, reusing previous results.
+
+    The result has the floating point type of the image - see as_float. It is the
+    same as that of skimage.filters.gaussian, but without its intermediate copies.
+    Large images are filtered in several threads - see gaussian.
+
+    Results are stored in the module level `filter_cache`, which can be resized or
+    inspected by the caller eg. `filter_cache.max_bytes = 2**30`.
+    """
+    image = as_float(image)
+    key = (image_key(image), float(sigma))
+    return filter_cache.get_or_compute(
+        key, lambda: gaussian(image, sigma, threads=threads)
+    )
+
+
+def gaussian(
+    image: np.ndarray,
+    sigma: float,
+    truncate: float = 4.0,
+    threads: Optional[int] = None,
+) -> np.ndarray:
+    """Gaussian filter of the image, in its dtype and with the nearest mode.
+
+    The image is split in bands of rows, each filtered in a thread together with the
+    rows around it that the filter reaches - truncate * sigma at most. scipy releases
+    the GIL while filtering, so the bands are filtered in parallel and, as each pixel
+    is computed from exactly the same values, the result is identical to filtering
+    the whole image at once. There are up to threads bands, by default FILTER_THREADS,
+    of at least MIN_BAND_ROWS rows each.
+    """
+    from scipy.ndimage import gaussian_filter
+
+    def band(start: int, stop: int) -> np.ndarray:
+        low, high = max(start - halo, 0), min(stop + halo, rows)
+        filtered = gaussian_filter(
+            image[low:high],
+            sigma,
+            output=image.dtype,
+            mode="nearest",
+            truncate=truncate,
+        )
+        first, last = start - low, stop - low
+        return filtered[first:last]
+
+    rows = image.shape[0]
+    halo = int(truncate * float(sigma) + 0.5)
+    bands = min(threads or FILTER_THREADS or 1, rows // max(MIN_BAND_ROWS, halo))
+    if bands <= 1:
+        return band(0, rows)
+
+    output = np.empty_like(image)
+    edges = np.linspace(0, rows, bands + 1).astype(int)
+    with ThreadPoolExecutor(bands) as pool:
+        for start, stop, filtered in zip(
+            edges, edges[1:], pool.map(band, edges[:-1], edges[1:])
+        ):
+            output[start:stop] = filtered
+    return output
+
+
+BOUNDARY_CONDITIONS = (
+    "periodic",
+    "free",
+    "fixed",
+    "free-fixed",
+    "fixed-free",
+    "fixed-fixed",
+    "free-free",
+)
+
+
+class SnakeSystem:
+    """Solver of the linear system of the internal energy of a snake.
+
+    The system matrix only depends on the number of points, the weights and the
+    boundary conditions, so it is built and factorised once for each combination -
+    see snake_system. For periodic snakes, the matrix is circulant and the system is
+    solved with FFTs. For the rest, its inverse is precomputed.
+    """
+
+    def __init__(
+        self, n: int, alpha: float, beta: float, gamma: float, boundary_condition: str
+    ):
+        if boundary_condition not in BOUNDARY_CONDITIONS:
+            raise ValueError(
+                f"Invalid boundary condition {boundary_condition!r}. "
+                f"Should be one of: {', '.join(BOUNDARY_CONDITIONS)}."
+            )
+        self.n = n
+        start, _, end = boundary_condition.partition("-")
+        end = end or start
+        self.fixed = (start == "fixed", end == "fixed")
+        self.free = (start == "free", end == "free")
+        self.eigenvalues: Optional[np.ndarray] = None
+        self.inverse: Optional[np.ndarray] = None
+
+        if boundary_condition == "periodic":
+            # Eigenvalues of the circulant matrix with first column
+            # [c0, c1, c2, 0, ..., 0, c2, c1]
+            c0, c1, c2 = 2 * alpha + 6 * beta + gamma, -alpha - 4 * beta, beta
+            k = 2 * np.pi * np.arange(n // 2 + 1) / n
+            self.eigenvalues = c0 + 2 * c1 * np.cos(k) + 2 * c2 * np.cos(2 * k)
+        else:
+            self.inverse = np.linalg.inv(
+                self._matrix(n, alpha, beta) + gamma * np.eye(n)
+            )
+
+    def _matrix(self, n: int, alpha: float, beta: float) -> np.ndarray:
+        """Matrix of the internal energy with the boundary conditions."""
+        eye = np.eye(n)
+        a = np.roll(eye, -1, axis=0) + np.roll(eye, -1, axis=1) - 2 * eye
+        b = (
+            np.roll(eye, -2, axis=0)
+            + np.roll(eye, -2, axis=1)
+            - 4 * np.roll(eye, -1, axis=0)
+            - 4 * np.roll(eye, -1, axis=1)
+            + 6 * eye
+        )
+        matrix = -alpha * a + beta * b
+        (start_fixed, end_fixed), (start_free, end_free) = self.fixed, self.free
+        if start_fixed:
+            matrix[:2] = 0
+            matrix[1, :3] = [1, -2, 1]
+        if end_fixed:
+            matrix[-2:] = 0
+            matrix[-2, -3:] = [1, -2, 1]
+        if start_free:
+            matrix[:2] = 0
+            matrix[0, :3] = [1, -2, 1]
+            matrix[1, :4] = [-1, 3, -3, 1]
+        if end_free:
+            matrix[-2:] = 0
+            matrix[-1, -3:] = [1, -2, 1]
+            matrix[-2, -4:] = [-1, 3, -3, 1]
+        return matrix
+
+    def solve(self, rhs: np.ndarray) -> np.ndarray:
+        """Solves the system for rhs of shape (n, k), keeping its precision."""
+        if self.inverse is not None:
+            return self.inverse.astype(rhs.dtype, copy=False) @ rhs
+
+        assert self.eigenvalues is not None
+        eigenvalues = self.eigenvalues.astype(rhs.dtype, copy=False)[:, None]
+        return np.fft.irfft(np.fft.rfft(rhs, axis=0) / eigenvalues, self.n, axis=0)
+
+
+@lru_cache(maxsize=32)
+def snake_system(
+    n: int,
+    alpha: float,
+    beta: float,
+    gamma: float,
+    boundary_condition: str = "periodic",
+) -> SnakeSystem:
+    """Cached solver of the internal energy system of snakes with n points."""
+    return SnakeSystem(n, alpha, beta, gamma, boundary_condition)
+
+
+class EnergyGradient:
+    """Gradient of the external energy of a snake, interpolated with splines.
+
+    The energy is interpolated with a quadratic spline, as in the active_contour of
+    scikit-image. Its derivatives are splines too, precomputed once, which are much
+    faster to evaluate on every iteration than asking the interpolant for them. They
+    are stored with the floating point type of the energy.
+    """
+
+    def __init__(self, energy: np.ndarray):
+        from scipy.interpolate import RectBivariateSpline
+
+        rows, cols = energy.shape
+        spline = RectBivariateSpline(
+            np.arange(cols), np.arange(rows), energy.T, kx=2, ky=2, s=0
+        )
+        tx, ty, c = spline.tck
+        kx, ky = spline.degrees
+        c = c.reshape(len(tx) - kx - 1, len(ty) - ky - 1)
+        dtx, dcx = derivative(tx, c, kx, axis=0)
+        dty, dcy = derivative(ty, c, ky, axis=1)
+        dtype = energy.dtype
+        self.x = ((dtx, ty), dcx.astype(dtype), (kx - 1, ky))
+        self.y = ((tx, dty), dcy.astype(dtype), (kx, ky - 1))
+
+    @property
+    def nbytes(self) -> int:
+        return self.x[1].nbytes + self.y[1].nbytes
+
+    def __call__(self, xy: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Gradient at the (n, 2) points in (x, y) coordinates."""
+        out = np.empty(xy.shape) if out is None else out
+        out[:, 0] = bispline(xy[:, 0], xy[:, 1], *self.x)
+        out[:, 1] = bispline(xy[:, 0], xy[:, 1], *self.y)
+        return out
+
+
+def external_energy(
+    image: np.ndarray, w_line: float = 0, w_edge: float = 1
+) -> EnergyGradient:
+    """Gradient of the external energy of the snake for the image.
+
+    The energy is the image times w_line plus its Sobel edges times w_edge, as in the
+    active_contour of scikit-image. Interpolating it takes a while for large images,
+    so the latest ones are kept in the module level `gradient_cache`, eg. for previews
+    of the same image. Like `filter_cache`, it is bounded by size in bytes.
+    """
+
+    def compute() -> EnergyGradient:
+        from skimage.filters import sobel
+
+        channels = image if image.ndim == 3 else image[..., None]
+        energy = sum(
+            w_line * channel + (w_edge * sobel(channel) if w_edge != 0 else 0)
+            for channel in np.moveaxis(channels, -1, 0)
+        )
+        return EnergyGradient(np.asarray(energy))
+
+    key = (image_key(image), float(w_line), float(w_edge))
+    return gradient_cache.get_or_compute(key, compute)
+
+
+def memory_usage() -> Dict[str, int]:
+    """Bytes used by the cached filtered images and energy gradients."""
+    return dict(filtered=filter_cache.nbytes, gradients=gradient_cache.nbytes)
+
+
+def snake_contour(
+    image: np.ndarray,
+    snake: np.ndarray,
+    alpha: float = 0.01,
+    beta: float = 0.1,
+    w_line: float = 0,
+    w_edge: float = 1,
+    gamma: float = 0.01,
+    max_px_move: float = 1.0,
+    max_num_iter: int = 2500,
+    convergence: float = 0.1,
+    boundary_condition: str = "periodic",
+    callback: Optional[Callable[[int, np.ndarray], bool]] = None,
+) -> Tuple[np.ndarray, int, bool]:
+    """Active contour model, fitting the snake to features of the image.
+
+    Same algorithm and arguments as skimage.segmentation.active_contour, with the
+    snake in (row, column) coordinates, but reusing the solver of the internal energy
+    and the interpolant of the external one between calls. The computation is done in
+    the floating point type of the image - see as_float.
+
+    After each iteration, callback - if any - is called with the number of iterations
+    done and the current snake, which is only valid during the call. If it returns
+    True, the iterations stop.
+
+    Returns the snake, the number of iterations run and if it converged.
+    """
+    max_num_iter = int(max_num_iter)
+    if max_num_iter <= 0:
+        raise ValueError("max_num_iter should be >0.")
+    convergence_order = 10
+
+    image = as_float(image)
+    dtype = image.dtype
+    gradient = external_energy(image, w_line, w_edge)
+    system = snake_system(len(snake), alpha, beta, gamma, boundary_condition)
+    (start_fixed, end_fixed), (start_free, end_free) = system.fixed, system.free
+
+    # Coordinates in (x, y) order, as used by the gradient
+    xy = np.array(snake[:, ::-1], dtype=dtype)
+    saved = np.empty((convergence_order,) + xy.shape, dtype=dtype)
+    force = np.empty_like(xy)
+    converged = False
+    for i in range(max_num_iter):
+        gradient(xy, out=force)
+        if start_fixed:
+            force[0] = 0
+        if end_fixed:
+            force[-1] = 0
+        if start_free:
+            force[0] *= 2
+        if end_free:
+            force[-1] *= 2
+
+        new = system.solve(gamma * xy + force)
+
+        # Movements are capped to max_px_move per iteration
+        delta = max_px_move * np.tanh(new - xy)
+        if start_fixed:
+            delta[0] = 0
+        if end_fixed:
+            delta[-1] = 0
+        xy += delta
+
+        # Convergence is checked against a number of previous configurations, since
+        # oscillations can occur
+        j = i % (convergence_order + 1)
+        if j < convergence_order:
+            saved[j] = xy
+        else:
+            distance = np.min(np.max(np.abs(saved - xy).sum(axis=2), axis=1))
+            if distance < convergence:
+                converged = True
+                break
+
+        if callback is not None and callback(i + 1, xy[:, ::-1]):
+            break
+
+    return xy[:, ::-1].copy(), i + 1, converged
+
+
+class Cancelled(Exception):
+    """Raised when a segmentation is cancelled before finishing."""
+
+
+class Segmentation(NamedTuple):
+    contour: np.ndarray
+    initial: np.ndarray
+    iterations: int
+    elapsed: float
+    converged: bool
+    settings: str = ""
+
+
+def normalized(value):
+    """Numbers as floats, so eg. sigma=1 and sigma=1.0 are the same parameter."""
+    if isinstance(value, (list, tuple)):
+        return [normalized(v) for v in value]
+    if isinstance(value, Real) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def _settings(**params) -> str:
+    """The parameters of a segmentation as a string, to find if they changed."""
+    named = {k: normalized(v) for k, v in params.items()}
+    return json.dumps(named, sort_keys=True, default=str)
+
+
+Callback = Callable[[int, int, float], None]
+
+
+def tracked_contour(
+    fimg: np.ndarray,
+    snake: np.ndarray,
+    max_iterations: int = 2500,
+    chunk: Optional[int] = None,
+    tolerance: float = 0.0,
+    callback: Optional[Callback] = None,
+    cancel: Optional[Event] = None,
+    **kwargs,
+) -> Tuple[np.ndarray, int, bool]:
+    """Runs snake_contour, checking the progress every chunk iterations.
+
+    After each chunk of 250 iterations by default, callback is called with the
+    iterations done so far, the maximum number of iterations and the largest
+    displacement of a contour point during the chunk. The contour is considered
+    converged once that displacement is below the tolerance. If cancel - eg. a
+    threading.Event - is set, Cancelled is raised at the end of the chunk.
+
+    Returns the contour, the number of iterations run and if it converged.
+    """
+    if cancel is not None and cancel.is_set():
+        raise Cancelled()
+
+    chunk = chunk or 250
+    previous = [np.asarray(snake)]
+    reported = [0]
+    stopped = [False]
+
+    def check(iterations: int, contour: np.ndarray) -> bool:
+        if iterations % chunk != 0:
+            return False
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+
+        displacement = float(np.max(np.linalg.norm(contour - previous[0], axis=1)))
+        previous[0] = contour.copy()
+        reported[0] = iterations
+        if callback is not None:
+            callback(iterations, max_iterations, displacement)
+        stopped[0] = displacement < tolerance
+        return stopped[0]
+
+    tracking = callback is not None or cancel is not None or tolerance > 0
+    contour, done, converged = snake_contour(
+        fimg,
+        snake,
+        max_num_iter=max_iterations,
+        callback=check if tracking else None,
+        **kwargs,
+    )
+    if callback is not None and done > reported[0]:
+        displacement = float(np.max(np.linalg.norm(contour - previous[0], axis=1)))
+        callback(done, max_iterations, displacement)
+    return contour, done, converged or stopped[0]
+
+
+def pyramid_contour(
+    fimg: np.ndarray,
+    initial: np.ndarray,
+    levels: int = 3,
+    level_iterations: Union[int, Sequence[int], None] = None,
+    callback: Optional[Callback] = None,
+    **kwargs,
+) -> Tuple[np.ndarray, int, bool]:
+    """Runs the active contour from coarse to fine in a pyramid of images.
+
+    Each level halves the size of the image of the one below, with level 0 being the
+    full resolution image. The contour found in each level is scaled up and used as
+    the starting point of the next, finer one. The maximum number of iterations per
+    level, from coarse to fine, can be given in level_iterations. By default, the
+    coarsest level gets a fifth of the snake_contour budget, each finer level half
+    of the previous one and the full resolution level the rest, so it can refine the
+    contour until it converges.
+
+    The weights and max_px_move are the same at every level. Coarse levels move the
+    contour by up to max_px_move of their pixels, 2**level full resolution ones, per
+    iteration, which is what makes them fast. Their image forces are stronger
+    relative to the internal ones, so the contour is more flexible there. On simple
+    images the result is very close to that of a single level. On cluttered ones,
+    the contour can settle on a different edge: on skimage.data.camera with sigma=3,
+    some points end up tens of pixels away, although most are within a few.
+
+    Coordinates are in (row, column) order, as in snake_contour. The rest of the
+    arguments are passed to tracked_contour, with the callback receiving the
+    iterations accumulated over all levels. The result is that of the finest level.
+    """
+    from skimage.transform import downscale_local_mean
+
+    budget = kwargs.pop(MAX_ITERATIONS, 2500)
+    if level_iterations is None:
+        level_iterations = [max(budget // 5 // 2**i, 1) for i in range(levels - 1)]
+        level_iterations.append(max(budget - sum(level_iterations), 1))
+    if isinstance(level_iterations, int):
+        level_iterations = [level_iterations] * levels
+    if len(level_iterations) != levels:
+        raise ValueError(f"Expected {levels} level iterations, got {level_iterations}")
+
+    total = sum(level_iterations)
+    contour = initial
+    done = 0
+    for level, iterations in zip(range(levels - 1, -1, -1), level_iterations):
+        factor = 2**level
+        if factor == 1:
+            scaled = fimg
+        else:
+            rows = fimg.shape[0] // factor * factor
+            cols = fimg.shape[1] // factor * factor
+            scaled = downscale_local_mean(fimg[:rows, :cols], (factor, factor))
+        offset = (factor - 1) / 2
+
+        def report(current, _, displacement, previous=done, factor=factor):
+            if callback is not None:
+                callback(previous + current, total, displacement * factor)
+
+        contour, run, converged = tracked_contour(
+            scaled,
+            (contour - offset) / factor,
+            max_iterations=iterations,
+            callback=report,
+            **kwargs,
+        )
+        contour = contour * factor + offset
+        done += run
+
+    return contour, done, converged
+
+
+def segment(
     image,
     nodes,
     sigma=1,
@@ -33,22 +657,310 @@ def segment_one_image(
     alpha=0.001,
     beta=0.1,
     gamma=0.01,
-    **kwargs
-):
-    initial = spline(np.array(nodes), resolution=resolution, degree=degree)
-    fimg = gaussian(image, sigma=sigma)
-    contour = active_contour(
-        fimg, initial[..., ::-1], alpha=alpha, beta=beta, gamma=gamma, **kwargs
-    )[..., ::-1]
-    return contour, initial
+    levels=1,
+    level_iterations=None,
+    chunk=None,
+    tolerance=0.0,
+    callback=None,
+    cancel=None,
+    dtype=None,
+    previous: Optional[Segmentation] = None,
+    warm_iterations=250,
+    **kwargs,
+) -> Segmentation:
+    """Segments the image starting from a spline passing through the nodes.
+
+    With levels > 1, the segmentation is done coarse to fine - see pyramid_contour.
+    Progress is reported to the callback and the segmentation stops early once the
+    contour moves less than the tolerance or when cancel is set - see tracked_contour.
+    The computation is done in the floating point type of the image or in dtype,
+    if given - see as_float. Any extra keyword argument is passed to snake_contour.
+
+    A previous result of segmenting the same image can be given. If it started from
+    the same spline - ie. only the other parameters changed - the segmentation
+    continues from its contour, in the full resolution image and for at most
+    warm_iterations, as it should already be close to the new one. If nothing changed
+    at all, the previous result is returned as it is, so segmenting again does not
+    move the contour any further.
+
+    Returns the segmented contour and the initial one, together with the number of
+    iterations, the time taken, if the contour converged and the rest of parameters
+    used, as a string.
+    """
+    start = perf_counter()
+    image = as_float(image, dtype)
+    with timing.span("spline"):
+        initial = spline(np.array(nodes), resolution=resolution, degree=degree)
+    if previous is not None and not (
+        np.shape(previous.initial) == initial.shape
+        and np.allclose(previous.initial, initial)
+    ):
+        # It started from another spline, so its contour is no better a start
+        previous = None
+    settings = _settings(
+        sigma=sigma,
+        alpha=alpha,
+        beta=beta,
+        gamma=gamma,
+        levels=levels,
+        level_iterations=level_iterations,
+        tolerance=tolerance,
+        dtype=image.dtype.name,
+        **kwargs,
+    )
+    if previous is not None and previous.settings == settings:
+        return previous
+
+    with timing.span("filter"):
+        fimg = filtered_image(image, sigma)
+    tracking = dict(
+        chunk=chunk,
+        tolerance=tolerance,
+        callback=callback,
+        cancel=cancel,
+        alpha=alpha,
+        beta=beta,
+        gamma=gamma,
+    )
+    with timing.span("snake"):
+        if previous is not None:
+            budget = kwargs.pop(MAX_ITERATIONS, 2500)
+            contour, iterations, converged = tracked_contour(
+                fimg,
+                np.asarray(previous.contour)[..., ::-1],
+                max_iterations=min(warm_iterations, budget),
+                **tracking,
+                **kwargs,
+            )
+        elif levels > 1:
+            contour, iterations, converged = pyramid_contour(
+                fimg,
+                initial[..., ::-1],
+                levels=levels,
+                level_iterations=level_iterations,
+                **tracking,
+                **kwargs,
+            )
+        else:
+            contour, iterations, converged = tracked_contour(
+                fimg,
+                initial[..., ::-1],
+                max_iterations=kwargs.pop(MAX_ITERATIONS, 2500),
+                **tracking,
+                **kwargs,
+            )
+    elapsed = perf_counter() - start
+    return Segmentation(
+        contour[..., ::-1], initial, iterations, elapsed, converged, settings
+    )
+
+
+def segment_one_image(image, nodes, **kwargs):
+    """Segments the image starting from a spline passing through the nodes.
+
+    Returns the segmented and the initial contours. See segment for the arguments,
+    including previous to continue from an earlier result.
+    """
+    result = segment(image, nodes, **kwargs)
+    return result.contour, result.initial
+
+
+class BatchResult(NamedTuple):
+    job: int
+    contour: Optional[np.ndarray]
+    initial: Optional[np.ndarray]
+    error: Optional[str]
+    elapsed: float
+    iterations: int = 0
+    converged: bool = False
+
+
+Job = Tuple[Any, Union[List, np.ndarray], Dict]
+
+
+def _segment_job(index: int, job: Job) -> BatchResult:
+    """Segments a single job, capturing any error rather than raising it."""
+    start = perf_counter()
+    try:
+        image, nodes, params = job
+        if not isinstance(image, np.ndarray):
+            from skimage.io import imread
+
+            dtype = params.get("dtype") or PRECISION
+            image = as_float(imread(image, as_gray=True), dtype)
+        result = segment(image, nodes, **params)
+        return BatchResult(
+            index,
+            result.contour,
+            result.initial,
+            None,
+            perf_counter() - start,
+            result.iterations,
+            result.converged,
+        )
+    except Exception as err:
+        error = f"{type(err).__name__}: {err}"
+        return BatchResult(index, None, None, error, perf_counter() - start)
+
+
+def _segment_chunk(chunk: List[Tuple[int, Job]]) -> List[BatchResult]:
+    return [_segment_job(index, job) for index, job in chunk]
+
+
+def segment_many(
+    jobs: Iterable[Job],
+    workers: Optional[int] = None,
+    chunksize: int = 1,
+    store=None,
+) -> Iterator[BatchResult]:
+    """Segments many images in a pool of processes.
+
+    Each job is a tuple (image or path, nodes, params), with params being a dictionary
+    of keyword arguments for segment_one_image. The results are yielded in completion
+    order, so their job - the position of the job in the input - identifies them.
+    Jobs that fail are reported as results with the error message and no contour.
+
+    Jobs are consumed lazily and sent to the workers in groups of chunksize, keeping
+    just a couple of chunks per worker in flight.
+
+    With a store - a python_guis.results.ResultStore - jobs segmented before are not
+    run again, their stored result being yielded instead, and new results are stored.
+
+    If a worker dies, eg. killed for using too much memory, the jobs it was running
+    or that were waiting in the pool are run again, each in a new process, and those
+    that kill it again are reported as failed. The rest of the batch goes on in a new
+    pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    numbered: Iterator[Tuple[int, Job]] = enumerate(jobs)
+    stored: List[BatchResult] = []
+    keys: Dict[int, str] = {}
+    if store is not None:
+        numbered = _not_stored(numbered, store, stored, keys)
+    chunks = iter(lambda: list(islice(numbered, chunksize)), [])
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker)
+    pending: Dict[Future, List[Tuple[int, Job]]] = {}
+
+    def save(results: Iterable[BatchResult]) -> Iterator[BatchResult]:
+        for result in results:
+            key = keys.pop(result.job, None)
+            segmentation = _as_segmentation(result)
+            if key is not None and segmentation is not None:
+                store.put(key, segmentation)
+            yield result
+
+    def finished(futures) -> Iterator[BatchResult]:
+        nonlocal pool
+        crashed: List[Tuple[int, Job]] = []
+        while futures:
+            for future in futures:
+                chunk = pending.pop(future)
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    crashed.extend(chunk)
+                else:
+                    yield from save(results)
+            # The whole pool breaks when a worker dies, so the rest of its jobs finish
+            # or fail straight away
+            futures = wait(pending)[0] if crashed else set()
+
+        if crashed:
+            pool.shutdown()
+            pool = ProcessPoolExecutor(workers, initializer=_init_worker)
+            for index, job in crashed:
+                yield from save([_segment_alone(index, job)])
+
+    try:
+        for chunk in chunks:
+            yield from stored
+            stored.clear()
+            pending[pool.submit(_segment_chunk, chunk)] = chunk
+            if len(pending) < 2 * workers:
+                continue
+            done = wait(pending, return_when=FIRST_COMPLETED)[0]
+            yield from finished(done)
+
+        yield from stored
+        while pending:
+            done = wait(pending, return_when=FIRST_COMPLETED)[0]
+            yield from finished(done)
+    finally:
+        pool.shutdown()
+
+
+def _init_worker():
+    """Prepares a process of segment_many.
+
+    The filter uses a single thread, leaving the cores to the other processes, and
+    the caches are disabled, as the images of a batch are usually all different.
+    """
+    global FILTER_THREADS
+    FILTER_THREADS = 1
+    filter_cache.max_bytes = 0
+    gradient_cache.max_bytes = 0
+
+
+def _segment_alone(index: int, job: Job) -> BatchResult:
+    """Segments the job in a new process, reporting it as failed if the process dies."""
+    with ProcessPoolExecutor(1, initializer=_init_worker) as pool:
+        try:
+            return pool.submit(_segment_job, index, job).result()
+        except BrokenProcessPool as err:
+            return BatchResult(index, None, None, f"{type(err).__name__}: {err}", 0.0)
+
+
+def _not_stored(numbered, store, stored: List[BatchResult], keys: Dict[int, str]):
+    """Yields the jobs without a stored result, adding the others to stored."""
+    from python_guis.results import job_key
+
+    for index, job in numbered:
+        try:
+            key = job_key(*job)
+        except Exception:
+            # Let the worker report the problem, eg. a missing file
+            yield index, job
+            continue
+
+        result = store.get(key)
+        if result is None:
+            keys[index] = key
+            yield index, job
+        else:
+            stored.append(
+                BatchResult(
+                    index,
+                    result.contour,
+                    result.initial,
+                    None,
+                    0.0,
+                    result.iterations,
+                    result.converged,
+                )
+            )
+
+
+def _as_segmentation(result: BatchResult) -> Optional[Segmentation]:
+    """The result of a job as that of segment, or None if it failed."""
+    if result.error is not None or result.contour is None or result.initial is None:
+        return None
+    return Segmentation(
+        result.contour,
+        result.initial,
+        result.iterations,
+        result.elapsed,
+        result.converged,
+    )
 
 
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
     from skimage.io import imread
 
+    from python_guis import INSECTS
+
     # First we load the image and transform it to greyscale
-    img = imread("insects.jpg", as_gray=True)
+    img = imread(INSECTS, as_gray=True)
 
     # Variable to accumulate the nodes
     nodes: List = []
@@ -64,16 +976,17 @@ if __name__ == "__main__":
     plt.show()
 
     # Create the spline, filter the image and run the segmentation
-    segment, initial = segment_one_image(img, nodes)
+    contour, initial = segment_one_image(img, nodes)
 
     # Finally, we plot the result
     fig = plt.figure()
     ax = fig.add_subplot()
     ax.imshow(img, cmap=plt.get_cmap("binary_r"))
-    ax.plot(*segment.T, label="Initial")
-    ax.plot(*initial.T, label="Segmented")
+    ax.plot(*initial.T, label="Initial")
+    ax.plot(*contour.T, label="Segmented")
     plt.show()
 
-    # And potentially save the data
-    # import numpy as np
-    # np.savetxt("silhouette.txt", silhouette)
+    # And potentially save the data, together with where it comes from
+    # from python_guis.contours import ContourWriter
+    # with ContourWriter("silhouette.contours") as contours:
+    #     contours.append(contour, image=str(INSECTS), nodes=nodes, initial=initial)
@@ -0,0 +1,137 @@
+"""Going through the images of a folder, preparing the next ones in the background.
+
+While the user works on an image, the next few are decoded, converted to greyscale
+and filtered in a background pool, so moving to them is almost instant. Images are
+opened as ImageSource, so decoding is only needed the first time, and the filtered
+image is left in model.filter_cache, where segment finds it.
+
+The GUIs do:
+
+    navigator = Navigator.from_folder(folder)
+    navigator.next().add_done_callback(runner.main_loop(image_loaded))
+
+where image_loaded gets the future with the ImageSource of the new current image.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import List, Sequence, Union
+
+from python_guis.images import IMAGE_SUFFIXES, ImageSource
+from python_guis.model import filtered_image
+
+
+def images_in(folder: Union[str, Path]) -> List[Path]:
+    """The image files in the folder, sorted by name."""
+    return sorted(
+        path
+        for path in Path(folder).iterdir()
+        if path.suffix.lower() in IMAGE_SUFFIXES and path.is_file()
+    )
+
+
+class Navigator:
+    """A list of images shown one at a time, with the next ones prepared in advance.
+
+    After moving to an image, the prefetch images after it and the one before it are
+    prepared by worker threads. At most max_prepared images are kept, dropping first
+    those furthest from the current one. Images are filtered with sigma, so it should
+    follow the filter width chosen by the user. Images with more than
+    ImageSource.in_memory pixels are only decoded, as their filtered image depends on
+    the region segmented.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[Union[str, Path]],
+        prefetch: int = 2,
+        max_prepared: int = 5,
+        sigma: float = 1,
+        workers: int = 2,
+        dtype=None,
+    ):
+        if not paths:
+            raise ValueError("There are no images to navigate.")
+
+        self.paths = [Path(p) for p in paths]
+        self.prefetch = prefetch
+        self.max_prepared = max(max_prepared, prefetch + 2)
+        self.sigma = sigma
+        self.dtype = dtype
+        self.index = 0
+        self._prepared: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="prefetch")
+
+    @classmethod
+    def from_folder(cls, folder: Union[str, Path], **kwargs) -> "Navigator":
+        """Navigator of the images in the folder - see images_in."""
+        return cls(images_in(folder), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @property
+    def path(self) -> Path:
+        return self.paths[self.index]
+
+    def describe(self) -> str:
+        """Position of the current image, eg. for the window title."""
+        return f"{self.index + 1}/{len(self)}"
+
+    def current(self) -> "Future[ImageSource]":
+        """The current image, starting to prepare the images around it."""
+        return self.go(self.index)
+
+    def next(self) -> "Future[ImageSource]":
+        """Moves to the next image, if any."""
+        return self.go(min(self.index + 1, len(self) - 1))
+
+    def previous(self) -> "Future[ImageSource]":
+        """Moves to the previous image, if any."""
+        return self.go(max(self.index - 1, 0))
+
+    def go(self, index: int) -> "Future[ImageSource]":
+        """Moves to the image with that index.
+
+        The future is already done if the image was prepared in advance.
+        """
+        self.index = index
+        future = self._prepare(index)
+        for i in range(index + 1, min(index + self.prefetch, len(self) - 1) + 1):
+            self._prepare(i)
+        if index > 0:
+            self._prepare(index - 1)
+        self._evict()
+        return future
+
+    def _prepare(self, index: int) -> Future:
+        with self._lock:
+            future = self._prepared.get(index)
+            if future is None or future.done() and future.exception() is not None:
+                future = self._executor.submit(self._load, self.paths[index])
+                self._prepared[index] = future
+            return future
+
+    def _load(self, path: Path) -> ImageSource:
+        source = ImageSource(path, dtype=self.dtype)
+        if source.in_memory:
+            filtered_image(source.data, self.sigma)
+        return source
+
+    def _evict(self):
+        with self._lock:
+            if len(self._prepared) <= self.max_prepared:
+                return
+            furthest = sorted(self._prepared, key=lambda i: abs(i - self.index))
+            for i in furthest[self.max_prepared :]:  # noqa: E203
+                self._prepared.pop(i).cancel()
+
+    def shutdown(self):
+        """Stops preparing images."""
+        with self._lock:
+            for future in self._prepared.values():
+                future.cancel()
+            self._prepared.clear()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,203 @@
+"""Adding, moving and deleting the nodes of the initial contour with the mouse.
+
+Left click on an empty spot adds a node after the last one, left click on a node and
+drag moves it, and right click on a node deletes it. The node under the cursor is
+found with a KD-tree of the nodes, built again only after they change, so picking is
+fast even with hundreds of nodes.
+
+The spline through the nodes is shown as they are edited. It is linear in the nodes
+- see splines.contour_basis - so moving node i by d moves the curve by column i of
+the basis matrix times d. That column is only significant near the node, so while
+dragging only that part of the curve is updated, without fitting the spline again.
+The parameters of the nodes, proportional to the distances between them, change a
+little as the node moves, so the spline is fitted again when the node is released.
+"""
+from typing import TYPE_CHECKING, Callable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from python_guis import timing
+from python_guis.model import node_overlay
+from python_guis.splines import contour_basis, splines
+
+if TYPE_CHECKING:
+    from scipy.spatial import cKDTree
+
+SUPPORT = 1e-3
+"""Smallest weight of a node on the points of the curve updated while dragging it.
+
+Leaving out the rest moves them by less than SUPPORT times the distance dragged. The
+curve is fitted again on release anyway.
+"""
+
+
+class _Drag(NamedTuple):
+    """A node being dragged and the part of the curve that depends on it."""
+
+    node: int
+    start: np.ndarray
+    rows: np.ndarray
+    initial: np.ndarray
+    weights: np.ndarray
+
+
+class NodeEditor:
+    """Nodes of a contour edited with the mouse on a matplotlib axes.
+
+    The nodes are a list of (x, y) tuples, as those built with model.add_node, that is
+    modified in place. Callbacks:
+
+    - on_change is called with the nodes after a node is added, moved or deleted.
+    - on_new_contour is called before adding the first node, eg. to remove old results.
+    - can_edit is called before any change, which is ignored if it returns False.
+
+    Nodes are picked within tolerance pixels of the cursor. Clicks are ignored while
+    the toolbar is zooming or panning.
+    """
+
+    def __init__(
+        self,
+        axes,
+        canvas,
+        on_change: Optional[Callable[[List[Tuple[float, float]]], None]] = None,
+        on_new_contour: Optional[Callable[[], None]] = None,
+        can_edit: Optional[Callable[[], bool]] = None,
+        tolerance: float = 8,
+        resolution: int = 360,
+        degree: int = 3,
+    ):
+        self.axes = axes
+        self.canvas = canvas
+        self.on_change = on_change
+        self.on_new_contour = on_new_contour
+        self.can_edit = can_edit
+        self.tolerance = tolerance
+        self.resolution = resolution
+        self.degree = degree
+        self.nodes: List[Tuple[float, float]] = []
+        self.curve: Optional[np.ndarray] = None
+        self._tree: Optional["cKDTree"] = None
+        self._drag: Optional[_Drag] = None
+        canvas.mpl_connect("button_press_event", self.on_press)
+        canvas.mpl_connect("motion_notify_event", self.on_motion)
+        canvas.mpl_connect("button_release_event", self.on_release)
+
+    def pick(self, x: float, y: float, radius: float) -> Optional[int]:
+        """Index of the node nearest to (x, y) within radius, if any."""
+        if not self.nodes:
+            return None
+        tree = self._tree
+        if tree is None:
+            from scipy.spatial import cKDTree
+
+            tree = self._tree = cKDTree(np.asarray(self.nodes))
+        distance, index = tree.query((x, y), distance_upper_bound=radius)
+        return None if np.isinf(distance) else int(index)
+
+    @timing.timed()
+    def add_node(self, x: float, y: float):
+        if not self.nodes and self.on_new_contour is not None:
+            self.on_new_contour()
+        self.nodes.append((x, y))
+        self._changed()
+
+    def delete_node(self, index: int):
+        del self.nodes[index]
+        self._changed()
+
+    def move_node(self, index: int, x: float, y: float):
+        self.nodes[index] = (x, y)
+        self._changed()
+
+    def clear(self):
+        """Forgets the nodes, leaving their drawing until a new contour is started."""
+        self.nodes.clear()
+        self.curve = None
+        self._tree = None
+        self._drag = None
+
+    def set_spline(self, resolution: int, degree: int):
+        """Changes the parameters of the spline, showing it again if needed."""
+        if (resolution, degree) != (self.resolution, self.degree):
+            self.resolution, self.degree = resolution, degree
+            if self.nodes:
+                self.refit()
+
+    def refit(self):
+        """Fits the spline through all the nodes and shows it."""
+        if len(self.nodes) >= max(self.degree, 3) and self.resolution > 1:
+            self.curve = splines(np.asarray(self.nodes), self.resolution, self.degree)
+        else:
+            self.curve = None
+        node_overlay(self.axes, self.canvas).update(self.nodes, self.curve)
+
+    def _changed(self):
+        self._tree = None
+        self.refit()
+        if self.on_change is not None:
+            self.on_change(self.nodes)
+
+    def start_drag(self, index: int):
+        """Starts moving the node, finding the part of the curve that depends on it."""
+        start = np.array(self.nodes[index])
+        if self.curve is None:
+            empty = np.empty((0, 2))
+            self._drag = _Drag(index, start, np.empty(0, int), empty, empty[:, :1])
+            return
+
+        basis = contour_basis(np.asarray(self.nodes), self.resolution, self.degree)
+        column = basis[:, index]
+        rows = np.flatnonzero(np.abs(column) > SUPPORT)
+        self._drag = _Drag(index, start, rows, self.curve[rows], column[rows, None])
+
+    @timing.timed()
+    def drag_node(self, x: float, y: float):
+        """Moves the node being dragged, updating the curve near it."""
+        drag = self._drag
+        if drag is None:
+            return
+        self.nodes[drag.node] = (x, y)
+        if self.curve is not None:
+            moved = drag.weights * (np.array([x, y]) - drag.start)
+            self.curve[drag.rows] = drag.initial + moved
+        node_overlay(self.axes, self.canvas).update(self.nodes, self.curve)
+
+    def end_drag(self):
+        """Finishes moving the node, fitting the spline again."""
+        self._drag = None
+        self._changed()
+
+    def _editable(self, event) -> bool:
+        toolbar = getattr(self.canvas, "toolbar", None)
+        return (
+            event.inaxes is self.axes
+            and not getattr(toolbar, "mode", "")
+            and (self.can_edit is None or self.can_edit())
+        )
+
+    def _radius(self) -> float:
+        """Tolerance in data units, for axes with equal aspect as those of images."""
+        inverse = self.axes.transData.inverted()
+        (x0, _), (x1, _) = inverse.transform([(0, 0), (self.tolerance, 0)])
+        return abs(x1 - x0)
+
+    def on_press(self, event):
+        if not self._editable(event):
+            return
+        index = self.pick(event.xdata, event.ydata, self._radius())
+        if index is None:
+            return
+        if event.button == 1:
+            self.start_drag(index)
+        elif event.button == 3:
+            self.delete_node(index)
+
+    def on_motion(self, event):
+        if self._drag is not None and event.inaxes is self.axes:
+            self.drag_node(event.xdata, event.ydata)
+
+    def on_release(self, event):
+        if self._drag is not None:
+            self.end_drag()
+        elif event.button == 1 and self._editable(event):
+            self.add_node(event.xdata, event.ydata)
@@ -0,0 +1,120 @@
+"""Reporting progress from background threads to a GUI, without flooding it.
+
+Workers may report progress far more often than it is worth redrawing, eg. after
+every item of a long loop. A ProgressChannel takes those reports from any thread and
+only keeps the latest, and the main loop of the GUI takes them out at most max_rate
+times per second, updating the widgets only if there is anything new. There is one
+pump for each of the toolkits used in the examples:
+
+    channel = ProgressChannel(show_progress, max_rate=30)
+    stop = tk_pump(root, channel)
+
+    # In the worker thread
+    for i, item in enumerate(items):
+        ...
+        channel.progress(i + 1, len(items))
+"""
+from threading import Lock
+from typing import Callable, NamedTuple, Optional
+
+
+class Progress(NamedTuple):
+    """Latest progress and status, and the number of reports received so far."""
+
+    value: float
+    total: Optional[float]
+    status: str
+    reports: int
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """Fraction of the total done, if the total is known."""
+        return None if not self.total else self.value / self.total
+
+
+class ProgressChannel:
+    """Latest progress and status reported by workers, delivered to the main loop.
+
+    Reporting is thread safe and cheap, so it can be done thousands of times per
+    second. The pump of the toolkit calls flush every 1 / max_rate seconds, which
+    calls on_update with the latest Progress, if it changed since the last call.
+    """
+
+    def __init__(self, on_update: Callable[[Progress], None], max_rate: float = 30):
+        self.on_update = on_update
+        self.max_rate = max_rate
+        self._lock = Lock()
+        self._latest = Progress(0, None, "", 0)
+        self._delivered = self._latest
+
+    @property
+    def interval(self) -> float:
+        """Seconds between updates of the main loop."""
+        return 1 / self.max_rate
+
+    def progress(self, value: float, total: Optional[float] = None):
+        """Reports the progress, eg. items done out of a total."""
+        with self._lock:
+            latest = self._latest
+            self._latest = latest._replace(
+                value=value, total=total, reports=latest.reports + 1
+            )
+
+    def status(self, text: str):
+        """Reports a short description of what is going on."""
+        with self._lock:
+            self._latest = self._latest._replace(
+                status=text, reports=self._latest.reports + 1
+            )
+
+    def flush(self):
+        """Calls on_update with the latest progress, if new. Call from the main loop."""
+        with self._lock:
+            latest = self._latest
+        if latest.reports != self._delivered.reports:
+            self._delivered = latest
+            self.on_update(latest)
+
+
+def tk_pump(widget, channel: ProgressChannel) -> Callable[[], None]:
+    """Flushes the channel from the Tk main loop of the widget, using `after`.
+
+    Returns a function that stops the pump.
+    """
+    interval = max(int(channel.interval * 1000), 1)
+    scheduled = [None]
+
+    def pump():
+        channel.flush()
+        scheduled[0] = widget.after(interval, pump)
+
+    def stop():
+        if scheduled[0] is not None:
+            widget.after_cancel(scheduled[0])
+            scheduled[0] = None
+
+    scheduled[0] = widget.after(interval, pump)
+    return stop
+
+
+def qt_pump(channel: ProgressChannel, parent=None) -> Callable[[], None]:
+    """Flushes the channel from the Qt main loop, using a QTimer.
+
+    It must be created from the main thread. Returns a function that stops the pump.
+    Without a parent, the timer lives as long as that function is referenced.
+    """
+    from PySide2.QtCore import QTimer
+
+    timer = QTimer(parent)
+    timer.setInterval(max(int(channel.interval * 1000), 1))
+    timer.timeout.connect(channel.flush)
+    timer.start()
+    return timer.stop
+
+
+def kivy_pump(channel: ProgressChannel) -> Callable[[], None]:
+    """Flushes the channel from the Kivy clock. Returns a function that stops it."""
+    from kivy.clock import Clock
+
+    event = Clock.schedule_interval(lambda dt: channel.flush(), channel.interval)
+    return event.cancel
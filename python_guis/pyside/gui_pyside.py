@@ -1,4 +1,5 @@
 import sys
+from threading import Event
 
 if sys.platform == "darwin":
     # There is an issue with pyside2 and MacOS BigSur. This hack sorts it
@@ -7,16 +8,20 @@ if sys.platform == "darwin":
 
     os.environ["QT_MAC_WANTS_LAYER"] = "1"
 
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT
 from matplotlib.figure import Figure
 from PySide2 import QtWidgets, QtGui
-from PySide2.QtCore import Qt
+from PySide2.QtCore import Qt, QTimer
 
 
-from python_guis import INSECTS
-from python_guis.model import add_node, segment_one_image
-from skimage.io import imread
+from python_guis import INSECTS, timing
+from python_guis.images import segment_source
+from python_guis.jobs import JobRunner, LivePreview, qt_dispatcher, qt_scheduler
+from python_guis.model import Cancelled
+from python_guis.navigator import Navigator
+from python_guis.nodes import NodeEditor
+from python_guis.results import default_store
+from python_guis.startup import prewarm
 
 
 class PlotArea(QtWidgets.QWidget):
@@ -34,6 +39,7 @@ class PlotArea(QtWidgets.QWidget):
         self.layout().addWidget(self.canvas)
         self.layout().addWidget(toolbar)
 
+    @timing.timed("draw")
     def draw(self):
         """Redraws the figure, updating its contents."""
         self.canvas.draw()
@@ -44,6 +50,15 @@ class Controls(QtWidgets.QWidget):
         super(Controls, self).__init__()
         self.setLayout(QtWidgets.QVBoxLayout())
 
+        # Navigation widgets
+        navigation = QtWidgets.QHBoxLayout()
+        self.open_button = QtWidgets.QPushButton("Open folder...")
+        self.previous_button = QtWidgets.QPushButton("<")
+        self.next_button = QtWidgets.QPushButton(">")
+        navigation.addWidget(self.open_button, 1)
+        navigation.addWidget(self.previous_button)
+        navigation.addWidget(self.next_button)
+
         # Slider widgets
         self.label = QtWidgets.QLabel("")
         self.slider = QtWidgets.QSlider(Qt.Horizontal)
@@ -71,19 +86,41 @@ class Controls(QtWidgets.QWidget):
         self.resolution_entry.setAlignment(Qt.AlignRight)
         resolution.addWidget(self.resolution_entry)
 
+        # Pyramid levels widgets
+        levels = QtWidgets.QHBoxLayout()
+        levels.addWidget(QtWidgets.QLabel("Pyramid levels: "))
+        self.levels_spinbox = QtWidgets.QSpinBox()
+        self.levels_spinbox.setRange(1, 5)
+        levels.addWidget(self.levels_spinbox)
+
         # Buttons
+        self.live_preview = QtWidgets.QCheckBox("Live preview")
         self.segment_button = QtWidgets.QPushButton("Perform segmentation")
+        self.progress = QtWidgets.QProgressBar()
+        self.progress.setRange(0, 100)
         self.reset_button = QtWidgets.QPushButton("Remove all")
+        self.show_timings = QtWidgets.QCheckBox("Show timings")
+        self.show_timings.setChecked(timing.is_enabled())
+        self.timings = QtWidgets.QLabel("")
+        self.timings.setWordWrap(True)
+        self.timings.setFrameStyle(QtWidgets.QFrame.Panel | QtWidgets.QFrame.Sunken)
+        self.timings.setVisible(timing.is_enabled())
 
         # Add widgets to the layout
+        self.layout().addLayout(navigation)
         self.layout().addWidget(self.label)
         self.layout().addWidget(self.slider)
         self.layout().addWidget(QtWidgets.QLabel("Spline parameters: "))
         self.layout().addLayout(buttons)
         self.layout().addLayout(resolution)
+        self.layout().addLayout(levels)
+        self.layout().addWidget(self.live_preview)
         self.layout().addWidget(self.segment_button)
+        self.layout().addWidget(self.progress)
         self.layout().addWidget(self.reset_button)
         self.layout().addStretch(1)
+        self.layout().addWidget(self.show_timings)
+        self.layout().addWidget(self.timings)
 
         self._set_label()
 
@@ -103,56 +140,130 @@ class Controls(QtWidgets.QWidget):
     def resolution(self):
         return int(self.resolution_entry.text())
 
+    @property
+    def levels(self):
+        return int(self.levels_spinbox.value())
+
+    @property
+    def parameters(self):
+        return dict(
+            sigma=self.gauss_width,
+            resolution=self.resolution,
+            degree=self.degree,
+            levels=self.levels,
+        )
+
+    def on_change(self, callback):
+        """Calls callback whenever any of the parameters changes."""
+        self.slider.valueChanged.connect(callback)
+        self.button_group.buttonClicked.connect(callback)
+        self.resolution_entry.textChanged.connect(callback)
+        self.levels_spinbox.valueChanged.connect(callback)
+        self.live_preview.toggled.connect(callback)
+
 
 class MySimpleGUI(QtWidgets.QWidget):
-    def __init__(self):
+    def __init__(self, folder=None):
         super().__init__()
         self.setLayout(QtWidgets.QHBoxLayout())
 
         self.filename = ""
         self.image = None
-        self.nodes = []
+        self.source = None
+        self.navigator = Navigator([INSECTS])
+        self.loading = None
+        self.runner = JobRunner(qt_dispatcher())
+        self.cancel = Event()
+        self.job = None
+        self.store = default_store()
+        self.preview = LivePreview(
+            self.runner,
+            qt_scheduler(),
+            segment_source,
+            on_done=self.show_preview,
+            on_error=self.preview_failed,
+        )
+        self.preview_lines = []
+        self.result_lines = []
+        self.last_result = None
 
         self.controls = Controls()
         self.controls.segment_button.clicked.connect(self.perform_segmentation)
         self.controls.reset_button.clicked.connect(self.remove_all_segmentations)
         self.controls.segment_button.setEnabled(False)
         self.controls.reset_button.setEnabled(False)
+        self.controls.on_change(self.parameters_changed)
+        self.controls.open_button.clicked.connect(lambda: self.open_folder())
+        self.controls.previous_button.clicked.connect(self.show_previous)
+        self.controls.next_button.clicked.connect(self.show_next)
+        for key, move in (
+            (QtGui.QKeySequence.MoveToPreviousPage, self.show_previous),
+            (QtGui.QKeySequence.MoveToNextPage, self.show_next),
+        ):
+            shortcut = QtWidgets.QShortcut(QtGui.QKeySequence(key), self)
+            shortcut.activated.connect(move)
+        self.controls.show_timings.toggled.connect(self.toggle_timings)
+        self.unsubscribe = timing.subscribe(self.runner.main_loop(self.show_timing))
         self.layout().addWidget(self.controls)
 
         self.plot = PlotArea()
+        self.editor = NodeEditor(
+            self.plot.axes,
+            self.plot.canvas,
+            on_change=self.nodes_changed,
+            on_new_contour=self.new_contour,
+            can_edit=self.can_edit,
+        )
         self.layout().addWidget(self.plot)
 
         # read image
-        self.read_image()
+        if folder is None:
+            self.read_image()
+        else:
+            self.open_folder(folder)
+
+        # import the segmentation libraries once the window is shown
+        QTimer.singleShot(0, prewarm)
 
     def remove_all_segmentations(self):
         """Removes all segmentations from memory."""
-        self.nodes = []
+        self.preview.stop()
+        self.last_result = None
+        self.editor.clear()
         self.controls.reset_button.setEnabled(False)
         self.plot.axes.lines.clear()
         self.plot.axes.get_legend().remove()
         self.plot.draw()
 
-    def add_node(self, event):
-        """Adds a node to the plot."""
-        if len(self.nodes) == 0:
-            self.plot.axes.lines.clear()
+    @property
+    def nodes(self):
+        """Nodes of the initial contour, edited with the mouse."""
+        return self.editor.nodes
+
+    def can_edit(self):
+        """Nodes can be edited unless a segmentation is running."""
+        return self.job is None or self.job.done()
 
-        add_node(event, self.nodes, self.plot.canvas)
+    def new_contour(self):
+        """Removes the previous contours when starting a new one."""
+        self.plot.axes.lines.clear()
 
+    def nodes_changed(self, nodes):
+        """Lets the user segment with 3 nodes or more, previewing it if enabled."""
         self.controls.reset_button.setEnabled(True)
-        if len(self.nodes) >= 3:
-            self.controls.segment_button.setEnabled(True)
+        self.controls.segment_button.setEnabled(len(nodes) >= 3)
+        self.parameters_changed()
 
     def redraw(self, segment=None, initial=None):
         """Redraws the axes after making a changes to the data."""
 
         if initial is not None:
-            self.plot.axes.plot(*initial.T, color="blue", label="Initial")
+            line = self.plot.axes.plot(*initial.T, color="blue", label="Initial")[0]
+            self.result_lines.append(line)
 
         if segment is not None:
-            self.plot.axes.plot(*segment.T, color="orange", label="Segmented")
+            line = self.plot.axes.plot(*segment.T, color="orange", label="Segmented")[0]
+            self.result_lines.append(line)
 
         if segment is not None or initial is not None:
             self.plot.axes.legend()
@@ -161,40 +272,218 @@ class MySimpleGUI(QtWidgets.QWidget):
 
     def draw(self):
         """Initial drawing of the plot."""
-        self.plot.axes.imshow(self.image, cmap=plt.get_cmap("binary_r"))
+        self.plot.axes.clear()
+        self.plot.axes.get_xaxis().set_visible(False)
+        self.plot.axes.get_yaxis().set_visible(False)
+        image, extent = self.source.display()
+        self.plot.axes.imshow(image, extent=extent, cmap="binary_r")
         self.plot.axes.set_title(
-            "Left click to add a control node.\n"
-            "At least 3 are needed to perform a segmentation."
+            "Left click to add a control node, drag it to move it and right click\n"
+            "to delete it. At least 3 are needed to perform a segmentation."
         )
         self.plot.draw()
 
     def perform_segmentation(self):
-        """Gets all the parameters from the widgets and performs the segmentation."""
-        sigma = self.controls.gauss_width
-        resolution = self.controls.resolution
-        degree = self.controls.degree
-
-        segment, initial = segment_one_image(
-            self.image, self.nodes, sigma=sigma, resolution=resolution, degree=degree
+        """Gets all the parameters from the widgets and starts the segmentation.
+
+        The segmentation runs in the background, so the window is still responsive.
+        It continues from the last result if only the parameters changed since.
+        """
+        try:
+            parameters = self.controls.parameters
+        except ValueError as err:
+            QtWidgets.QMessageBox.critical(self, "Invalid parameters", str(err))
+            return
+
+        self.preview.stop()
+        self.controls.segment_button.setEnabled(False)
+        self.controls.progress.setValue(0)
+        self.job = self.runner.submit(
+            segment_source,
+            self.source,
+            list(self.nodes),
+            store=self.store,
+            previous=self.last_result,
+            **parameters,
+            callback=self.runner.main_loop(self.show_progress),
+            cancel=self.cancel,
+            on_done=self.segmentation_done,
+            on_error=self.segmentation_failed,
         )
 
+    def parameters_changed(self, *args):
+        """Segments again in the background with the new parameters, if previewing."""
+        self.navigator.sigma = self.controls.gauss_width
+        try:
+            parameters = self.controls.parameters
+        except ValueError:
+            # The resolution is not a valid number while it is being edited
+            parameters = None
+        else:
+            self.editor.set_spline(parameters["resolution"], parameters["degree"])
+
+        if not self.controls.live_preview.isChecked() or len(self.nodes) < 3:
+            self.hide_preview()
+        elif parameters is not None:
+            # Continues from the last result if only the parameters changed
+            self.preview.update(
+                self.source,
+                list(self.nodes),
+                store=self.store,
+                previous=self.last_result,
+                **parameters,
+            )
+
+    def show_preview(self, result):
+        """Replaces the previous preview with a new one."""
+        self.remove_preview()
+        self.last_result = result
+        axes = self.plot.axes
+        self.preview_lines = [
+            axes.plot(*result.initial.T, "--", color="blue", label="Preview")[0],
+            axes.plot(*result.contour.T, "--", color="orange")[0],
+        ]
+        axes.legend()
+        self.redraw()
+
+    def remove_preview(self):
+        """Removes the lines of the preview, if still in the plot."""
+        for line in self.preview_lines:
+            if line in self.plot.axes.lines:
+                line.remove()
+        if self.preview_lines and self.plot.axes.get_legend() is not None:
+            self.plot.axes.legend()
+        self.preview_lines = []
+
+    def hide_preview(self):
+        """Stops previewing, removing the last preview from the plot."""
+        self.preview.stop()
+        if self.preview_lines:
+            self.remove_preview()
+            self.redraw()
+
+    def preview_failed(self, error):
+        """Reports a failed preview, turning previewing off."""
+        self.controls.live_preview.setChecked(False)
+        if not isinstance(error, Cancelled):
+            QtWidgets.QMessageBox.critical(self, "Preview failed", str(error))
+
+    def show_progress(self, iterations, total, displacement):
+        """Updates the progress bar with the fraction of iterations done."""
+        self.controls.progress.setValue(int(100 * iterations / total))
+
+    def segmentation_done(self, result):
+        """Shows the result of a segmentation."""
+        self.controls.progress.setValue(100)
         self.controls.reset_button.setEnabled(True)
-        self.controls.segment_button.setEnabled(False)
-
-        self.nodes = []
-        self.redraw(segment, initial)
+        self.controls.segment_button.setEnabled(True)
+
+        # The nodes are kept, so the contour can be tweaked and segmented again
+        self.last_result = result
+        self.remove_preview()
+        self.remove_result()
+        self.redraw(result.contour, result.initial)
+
+    def remove_result(self):
+        """Removes the lines of the last segmentation, if still in the plot."""
+        for line in self.result_lines:
+            if line in self.plot.axes.lines:
+                line.remove()
+        self.result_lines = []
+
+    def segmentation_failed(self, error):
+        """Reports a failed segmentation, letting the user try again."""
+        self.controls.progress.setValue(0)
+        self.controls.segment_button.setEnabled(True)
+        if not isinstance(error, Cancelled):
+            QtWidgets.QMessageBox.critical(self, "Segmentation failed", str(error))
+
+    def toggle_timings(self, checked):
+        """Starts or stops timing the stages, showing them below the controls."""
+        if checked:
+            timing.enable()
+        else:
+            timing.disable()
+        self.controls.timings.setVisible(checked)
+
+    def show_timing(self, span):
+        """Updates the readout with the latest timings."""
+        self.controls.timings.setText(timing.readout())
+
+    def closeEvent(self, event):
+        """Cancels any running segmentation before closing the window."""
+        self.unsubscribe()
+        self.cancel.set()
+        self.preview.stop()
+        self.navigator.shutdown()
+        self.runner.shutdown()
+        super().closeEvent(event)
+
+    def open_folder(self, folder=None):
+        """Goes through the images of the folder, asking for it if not given."""
+        folder = folder or QtWidgets.QFileDialog.getExistingDirectory(
+            self, "Open folder"
+        )
+        if not folder:
+            return
+
+        try:
+            navigator = Navigator.from_folder(folder, sigma=self.controls.gauss_width)
+        except (OSError, ValueError) as err:
+            QtWidgets.QMessageBox.critical(self, "Can not open folder", str(err))
+            return
+        self.navigator.shutdown()
+        self.navigator = navigator
+        self.read_image()
 
-    def read_image(self, *args):
-        """Opens the image to segment."""
-        self.image = imread(INSECTS, as_gray=True)
+    def show_next(self):
+        """Moves to the next image of the folder."""
+        self.read_image(self.navigator.next)
+
+    def show_previous(self):
+        """Moves to the previous image of the folder."""
+        self.read_image(self.navigator.previous)
+
+    def read_image(self, move=None):
+        """Opens the image to segment, unless a segmentation is running.
+
+        Images are loaded in the background - see Navigator - and shown once ready.
+        """
+        if self.job is not None and not self.job.done():
+            return
+
+        self.loading = (move or self.navigator.current)()
+        self.loading.add_done_callback(self.runner.main_loop(self.image_loaded))
+
+    def image_loaded(self, future):
+        """Shows the image just loaded, unless another one was requested since."""
+        if future is not self.loading or future.cancelled():
+            return
+        if future.exception() is not None:
+            QtWidgets.QMessageBox.critical(
+                self, "Can not open image", str(future.exception())
+            )
+            return
+
+        self.source = future.result()
+        self.image = self.source.data
+        self.setWindowTitle(
+            f"Beetle Picker - {self.navigator.describe()} {self.source.describe()}"
+        )
+        self.preview.stop()
+        self.preview_lines = []
+        self.last_result = None
+        self.editor.clear()
+        self.controls.segment_button.setEnabled(False)
+        self.controls.reset_button.setEnabled(False)
+        self.controls.progress.setValue(0)
         self.draw()
-        self.plot.canvas.mpl_connect("button_release_event", self.add_node)
 
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication([])
 
-    gui = MySimpleGUI()
+    gui = MySimpleGUI(*sys.argv[1:2])
     gui.show()
 
     sys.exit(app.exec_())
@@ -0,0 +1,267 @@
+"""Persistent store of segmentation results, shared by the GUIs, the CLI and the API.
+
+Results are kept in an SQLite database, by default in the user cache directory, so
+segmenting again an image with the same nodes and parameters - even in another
+session or from another frontend - returns the previous contour instantly. Results
+are identified by a hash of the image, the nodes and all the parameters of
+model.segment. Images given as files are identified by their location, size and
+modification time, so they don't need reading, let alone decoding, to look them up.
+Images in memory are identified by their contents.
+
+The store is bounded in size and age: entries not used for max_age seconds are
+removed, and then the least recently used ones until the total size of the contours
+is below max_bytes.
+"""
+from hashlib import blake2b
+import inspect
+import json
+from pathlib import Path
+import sqlite3
+from threading import Lock
+from time import time
+from typing import Dict, NamedTuple, Optional, Union
+
+import numpy as np
+
+from python_guis.cache import image_key
+from python_guis.model import (
+    PRECISION,
+    Segmentation,
+    as_float,
+    float_type,
+    normalized,
+    segment,
+)
+
+RESULTS_PATH = Path.home() / ".cache" / "python_guis" / "results.sqlite"
+"""Default location of the store."""
+
+IGNORED = ("image", "nodes", "callback", "cancel")
+"""Arguments of model.segment that do not change the result."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    dtype TEXT NOT NULL,
+    contour BLOB NOT NULL,
+    initial BLOB NOT NULL,
+    iterations INTEGER NOT NULL,
+    elapsed REAL NOT NULL,
+    converged INTEGER NOT NULL,
+    settings TEXT NOT NULL DEFAULT '',
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+class StoreInfo(NamedTuple):
+    entries: int
+    nbytes: int
+    max_bytes: int
+    max_age: float
+
+
+def file_key(path: Union[str, Path], dtype=None) -> str:
+    """Key of an image file to be loaded as dtype.
+
+    It is a hash of the location, size and modification time of the file, so the file
+    is not read. Moving or modifying the file gives it a new key.
+    """
+    path = Path(path)
+    stat = path.stat()
+    dtype = np.dtype(dtype or PRECISION)
+    identity = f"{path.resolve()}{stat.st_size}{stat.st_mtime_ns}{dtype.str}"
+    return blake2b(identity.encode(), digest_size=16).hexdigest()
+
+
+def result_key(image: str, nodes, params: Dict) -> str:
+    """Key of the result of segmenting the image - given by its key - with params.
+
+    The params are completed with the defaults of model.segment, so leaving out a
+    parameter or giving its default value results in the same key. Numbers are
+    compared as floats, and dtype by the name of the floating point type actually
+    used, PRECISION if not given. Callers segmenting images already in floating point
+    should give the type of the image as dtype.
+    """
+    arguments = inspect.signature(segment).bind(None, None, **params)
+    arguments.apply_defaults()
+    previous = arguments.arguments.pop("previous")
+    named = {
+        k: normalized(v) for k, v in arguments.arguments.items() if k not in IGNORED
+    }
+    named.update((k, normalized(v)) for k, v in named.pop("kwargs", {}).items())
+    named["dtype"] = np.dtype(named["dtype"] or PRECISION).name
+    if previous is not None:
+        # Results continued from another one depend on its contour
+        named["previous"] = image_key(np.asarray(previous.contour))
+
+    digest = blake2b(digest_size=16)
+    digest.update(image.encode())
+    digest.update(np.ascontiguousarray(nodes, dtype=float).tobytes())
+    digest.update(json.dumps(named, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def job_key(image, nodes, params: Dict) -> str:
+    """Key of the result of a job of model.segment_many."""
+    if isinstance(image, np.ndarray):
+        data = as_float(image, params.get("dtype"))
+        return result_key(image_key(data), nodes, dict(params, dtype=data.dtype))
+    return result_key(file_key(image, params.get("dtype")), nodes, params)
+
+
+class ResultStore:
+    """Segmentation results stored in an SQLite database, safe to use from threads.
+
+    Several processes can use the same database at the same time, eg. a GUI and the
+    command line interface.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path, None] = None,
+        max_bytes: int = 256 * 2**20,
+        max_age: float = 30 * 24 * 3600,
+    ):
+        self.path = Path(path or RESULTS_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(results)")]
+            if "settings" not in columns:
+                # Stores created before the settings of the results were kept
+                self._db.execute(
+                    "ALTER TABLE results ADD COLUMN settings TEXT NOT NULL DEFAULT ''"
+                )
+
+    def get(self, key: str) -> Optional[Segmentation]:
+        """The result stored with that key, if any, marking it as recently used."""
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT dtype, contour, initial, iterations, elapsed, converged, "
+                "settings FROM results WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?", (time(), key)
+            )
+
+        dtype, contour, initial, iterations, elapsed, converged, settings = row
+        return Segmentation(
+            np.frombuffer(contour, dtype=dtype).reshape(-1, 2),
+            np.frombuffer(initial, dtype=float).reshape(-1, 2),
+            iterations,
+            elapsed,
+            bool(converged),
+            settings,
+        )
+
+    def put(self, key: str, result: Segmentation):
+        """Stores the result, evicting old entries if needed."""
+        contour = np.ascontiguousarray(result.contour)
+        initial = np.ascontiguousarray(result.initial, dtype=float)
+        now = time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, dtype, contour, initial, "
+                "iterations, elapsed, converged, settings, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    contour.dtype.str,
+                    contour.tobytes(),
+                    initial.tobytes(),
+                    int(result.iterations),
+                    float(result.elapsed),
+                    int(result.converged),
+                    result.settings,
+                    contour.nbytes + initial.nbytes,
+                    now,
+                    now,
+                ),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        self._db.execute(
+            "DELETE FROM results WHERE accessed < ?", (now - self.max_age,)
+        )
+        total = self._db.execute("SELECT SUM(size) FROM results").fetchone()[0] or 0
+        if total <= self.max_bytes:
+            return
+
+        # Remove the least recently used entries until enough space is freed
+        excess, last = total - self.max_bytes, None
+        for accessed, size in self._db.execute(
+            "SELECT accessed, size FROM results ORDER BY accessed"
+        ).fetchall():
+            excess -= size
+            last = accessed
+            if excess <= 0:
+                break
+        self._db.execute("DELETE FROM results WHERE accessed <= ?", (last,))
+
+    def clear(self):
+        """Removes all the results."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM results")
+
+    def info(self) -> StoreInfo:
+        with self._lock:
+            entries, nbytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return StoreInfo(entries, nbytes, self.max_bytes, self.max_age)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_default: Optional[ResultStore] = None
+_default_lock = Lock()
+
+
+def default_store() -> ResultStore:
+    """The store at RESULTS_PATH, shared by everything in this process."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ResultStore()
+        return _default
+
+
+def segment_cached(
+    image: np.ndarray,
+    nodes,
+    store: Optional[ResultStore] = None,
+    key: Optional[str] = None,
+    **params,
+) -> Segmentation:
+    """model.segment, returning the stored result if it was segmented before.
+
+    The image is identified by key, if given, or by the hash of its contents. Images
+    loaded from a file should be given its file_key, so their results are shared with
+    the other frontends. The store defaults to default_store().
+    """
+    store = store or default_store()
+    dtype = float_type(np.asarray(image).dtype, params.get("dtype"))
+    if key is None:
+        key = image_key(as_float(image, dtype))
+    key = result_key(key, nodes, dict(params, dtype=dtype))
+
+    result = store.get(key)
+    if result is None:
+        result = segment(image, nodes, **params)
+        store.put(key, result)
+    return result
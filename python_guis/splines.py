@@ -0,0 +1,208 @@
+"""Interpolation of closed contours with periodic B-splines.
+
+Evaluating the spline of a contour is a linear operation on its nodes: the curve is
+just a (resolution, nodes) basis matrix times the (nodes, 2) array of coordinates. So
+many contours with the same number of nodes can be evaluated in one go by stacking
+their basis matrices. The result is the same as `scipy.interpolate.splprep` with
+`s=0, per=True` followed by `splev`.
+
+The basis depends on how the nodes are parametrised. With the default chord length
+parametrisation, as in splprep, it depends on the distance between nodes and has to
+be computed for each contour. With a uniform parametrisation it only depends on the
+resolution, degree and number of nodes, so it is computed once and cached.
+"""
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+
+def bspline_basis(
+    x: np.ndarray, knots: np.ndarray, degree: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Values of the B-splines of the given knots that are not zero at x.
+
+    Vectorised version of the de Boor algorithm, for points x of shape (..., points)
+    and knots of shape (..., nknots). Returns the values of the degree + 1 non-zero
+    B-splines at each point, of shape (..., points, degree + 1), and the index of the
+    first of them, of shape (..., points).
+    """
+    # Knots and points of all contours are laid out in a single sorted sequence, as
+    # their values are within [-1, 2], so that a single searchsorted finds all spans
+    m = knots.shape[-1]
+    row = 4 * np.arange(int(np.prod(knots.shape[:-1]))).reshape(knots.shape[:-1])
+    flat_knots = (knots + row[..., None]).ravel()
+    flat = np.searchsorted(flat_knots, (x + row[..., None]).ravel(), side="right")
+    span = flat.reshape(x.shape) - 1 - row[..., None] // 4 * m
+    span = np.clip(span, degree, m - degree - 2)
+    base = row[..., None] // 4 * m + span
+
+    def knot(offset):
+        return knots.ravel()[base + offset]
+
+    left = [x - knot(1 - j) for j in range(degree + 1)]
+    right = [knot(j) - x for j in range(degree + 1)]
+    values = [np.ones_like(x)]
+    for j in range(1, degree + 1):
+        saved = np.zeros_like(x)
+        for r in range(j):
+            temp = values[r] / (right[r + 1] + left[j - r])
+            values[r] = saved + right[r + 1] * temp
+            saved = left[j - r] * temp
+        values.append(saved)
+    return np.stack(values, axis=-1), span - degree
+
+
+def _periodic_knots(u: np.ndarray, degree: int) -> np.ndarray:
+    """Knots of the periodic splines with nodes at parameters u."""
+    n = u.shape[-1] - 1
+    before = u.take(range(n - degree, n), axis=-1) - 1
+    after = u.take(range(1, degree + 1), axis=-1) + 1
+    return np.concatenate((before, u, after), axis=-1)
+
+
+def _periodic_values(
+    x: np.ndarray, u: np.ndarray, degree: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Non-zero values of the periodic B-splines at x and the nodes they belong to.
+
+    The contours have nodes at parameters u, of shape (..., nodes + 1), starting at 0
+    and ending at 1, which is the first node again.
+    """
+    n = u.shape[-1] - 1
+    x = np.broadcast_to(x, u.shape[:-1] + x.shape[-1:])
+    values, first = bspline_basis(x, _periodic_knots(u, degree), degree)
+    return values, (first[..., None] + np.arange(degree + 1)) % n
+
+
+def _dense(values: np.ndarray, index: np.ndarray, n: int) -> np.ndarray:
+    """Dense (..., points, n) matrix with the values of the B-splines of each node."""
+    dense = np.zeros(values.shape[:-1] + (n,))
+    for i, v in zip(np.moveaxis(index, -1, 0), np.moveaxis(values, -1, 0)):
+        total = np.take_along_axis(dense, i[..., None], axis=-1) + v[..., None]
+        np.put_along_axis(dense, i[..., None], total, axis=-1)
+    return dense
+
+
+def _collocation(u: np.ndarray, degree: int) -> np.ndarray:
+    """Matrices of the values of the B-splines of each node at the nodes."""
+    n = u.shape[-1] - 1
+    return _dense(*_periodic_values(u[..., :n], u, degree), n)
+
+
+def _check_nodes(nodes: int, degree: int):
+    if nodes < max(degree, 2):
+        raise ValueError(
+            f"At least {max(degree, 2)} nodes are needed for a spline of degree "
+            f"{degree}, but got {nodes}."
+        )
+
+
+@lru_cache(maxsize=64)
+def uniform_basis(resolution: int, degree: int, nodes: int) -> np.ndarray:
+    """Cached basis matrix for equally spaced parameters of the nodes."""
+    _check_nodes(nodes, degree)
+    u = np.linspace(0, 1, nodes + 1)
+    evaluation = _dense(
+        *_periodic_values(np.linspace(0, 1, resolution), u, degree), nodes
+    )
+    basis = np.linalg.solve(_collocation(u, degree).T, evaluation.T).T
+    basis.flags.writeable = False
+    return basis
+
+
+def chord_parameters(nodes: np.ndarray) -> np.ndarray:
+    """Cumulative chord lengths of closed contours, normalised to the [0, 1] range.
+
+    For nodes of shape (..., nodes, 2), returns an array of shape (..., nodes + 1).
+    """
+    closed = np.concatenate((nodes, nodes[..., :1, :]), axis=-2)
+    chords = np.linalg.norm(np.diff(closed, axis=-2), axis=-1)
+    u = np.concatenate((np.zeros(chords.shape[:-1] + (1,)), chords), axis=-1)
+    u = np.cumsum(u, axis=-1)
+    return u / u[..., -1:]
+
+
+def contour_basis(
+    nodes: np.ndarray, resolution: int = 360, degree: int = 3, uniform: bool = False
+) -> np.ndarray:
+    """Basis matrices of shape (..., resolution, nodes) for the given contours."""
+    n = nodes.shape[-2]
+    _check_nodes(n, degree)
+    if uniform:
+        basis = uniform_basis(resolution, degree, n)
+        return np.broadcast_to(basis, nodes.shape[:-2] + basis.shape)
+
+    u = chord_parameters(nodes)
+    x = np.linspace(0, 1, resolution)
+    evaluation = _dense(*_periodic_values(x, u, degree), n)
+    collocation = _collocation(u, degree)
+    return np.linalg.solve(
+        collocation.swapaxes(-1, -2), evaluation.swapaxes(-1, -2)
+    ).swapaxes(-1, -2)
+
+
+def splines(
+    nodes: np.ndarray, resolution: int = 360, degree: int = 3, uniform: bool = False
+) -> np.ndarray:
+    """Closed splines passing through the nodes of many contours at once.
+
+    The nodes have shape (..., nodes, 2), all contours having the same number of
+    nodes, and the result has shape (..., resolution, 2). For a single contour with
+    the chord length parametrisation, splprep is faster as it has less overhead.
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    n = nodes.shape[-2]
+    _check_nodes(n, degree)
+    if uniform:
+        return uniform_basis(resolution, degree, n) @ nodes
+
+    # Solving for the coefficients and adding up the few non-zero B-splines at each
+    # point is much cheaper than building the whole basis matrix.
+    u = chord_parameters(nodes)
+    coefficients = np.linalg.solve(_collocation(u, degree), nodes)
+    values, index = _periodic_values(np.linspace(0, 1, resolution), u, degree)
+    contours = np.arange(int(np.prod(index.shape[:-2]))).reshape(index.shape[:-2])
+    terms = coefficients.reshape(-1, 2)[contours[..., None, None] * n + index]
+    return np.einsum("...k,...kc->...c", values, terms)
+
+
+def derivative(
+    knots: np.ndarray, coefficients: np.ndarray, degree: int, axis: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Knots and coefficients of the derivative of a spline along an axis.
+
+    The derivative of a spline of degree k is a spline of degree k - 1, with the
+    first and last knots removed.
+    """
+    coefficients = np.moveaxis(coefficients, axis, 0)
+    m = len(knots)
+    spacing = knots.take(range(degree + 1, m - 1)) - knots.take(
+        range(1, m - degree - 1)
+    )
+    shape = (-1,) + (1,) * (coefficients.ndim - 1)
+    result = degree * np.diff(coefficients, axis=0) / spacing.reshape(shape)
+    return knots[1:-1], np.moveaxis(result, 0, axis)
+
+
+def bispline(
+    x: np.ndarray,
+    y: np.ndarray,
+    knots: Tuple[np.ndarray, np.ndarray],
+    coefficients: np.ndarray,
+    degrees: Tuple[int, int],
+) -> np.ndarray:
+    """Values at the points (x, y) of a tensor product spline.
+
+    The coefficients have shape (x coefficients, y coefficients), as those of
+    scipy.interpolate.RectBivariateSpline reshaped. Points outside of the domain are
+    moved to its boundary, as in FITPACK.
+    """
+    (tx, ty), (kx, ky) = knots, degrees
+    x = np.clip(x, tx[kx], tx[-kx - 1])
+    y = np.clip(y, ty[ky], ty[-ky - 1])
+    vx, ix = bspline_basis(x, tx, kx)
+    vy, iy = bspline_basis(y, ty, ky)
+    rows = ix[:, None, None] + np.arange(kx + 1)[:, None]
+    cols = iy[:, None, None] + np.arange(ky + 1)
+    return np.einsum("pi,pij,pj->p", vx, coefficients[rows, cols], vy)
@@ -0,0 +1,124 @@
+"""Making the GUIs start faster and finding out where their start up time goes.
+
+The model imports scikit-image and scipy the first time they are needed, so the
+window appears sooner, but then the first segmentation takes longer. To avoid that,
+the frontends call `prewarm` once the window is shown, importing those modules in a
+background thread while the user is still placing the nodes. Set the environment
+variable PYTHON_GUIS_PREWARM=0 to disable it.
+
+Running this module prints which modules take longest to import for a frontend:
+
+    python -m python_guis.startup python_guis.tkinter.gui_tkinter
+"""
+from argparse import ArgumentParser
+import os
+import re
+import subprocess
+import sys
+from threading import Thread
+from typing import List, NamedTuple, Optional, Sequence
+
+HEAVY_MODULES = (
+    "scipy.interpolate",
+    "skimage.filters",
+    "skimage.io",
+    "skimage.transform",
+)
+"""Modules imported lazily by the model and worth importing in advance."""
+
+FRONTENDS = (
+    "python_guis.tkinter.gui_tkinter",
+    "python_guis.pyside.gui_pyside",
+    "python_guis.kivy.gui_kivy",
+)
+
+
+def prewarm(modules: Sequence[str] = HEAVY_MODULES) -> Optional[Thread]:
+    """Imports the modules in a background thread, returning the thread.
+
+    Nothing is done if the PYTHON_GUIS_PREWARM environment variable is 0. Errors are
+    ignored, as they will be raised again when the module is really needed.
+    """
+    if os.environ.get("PYTHON_GUIS_PREWARM", "1") == "0":
+        return None
+
+    def run():
+        from importlib import import_module
+
+        for module in modules:
+            try:
+                import_module(module)
+            except Exception:
+                pass
+
+    thread = Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self: float
+    cumulative: float
+    depth: int
+
+
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(module: str) -> List[ImportTime]:
+    """Time taken to import the module and its dependencies, in seconds.
+
+    The module is imported in a new interpreter with `-X importtime`, so nothing has
+    been imported in advance. Depth is the nesting level of the import: the module and
+    its parent packages have depth 0 and the modules they import directly depth 1.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        raise ImportError(lines[-1] if lines else f"Can not import {module}")
+
+    times = []
+    for match in _IMPORT_TIME.finditer(process.stderr):
+        own, cumulative, indent, name = match.groups()
+        times.append(
+            ImportTime(name, int(own) * 1e-6, int(cumulative) * 1e-6, len(indent) // 2)
+        )
+    return times
+
+
+def report(module: str, top: int = 15) -> str:
+    """Summary of the import time of the module and its slowest dependencies."""
+    times = import_times(module)
+    total = next(t.cumulative for t in times if t.module == module)
+    packages = [t for t in times if t.depth <= 1 and t.module != module]
+    lines = [f"{module}: {total:.3f} s", "", "Slowest direct imports (cumulative):"]
+    for t in sorted(packages, key=lambda t: t.cumulative, reverse=True)[:top]:
+        lines.append(f"  {t.cumulative:8.3f} s  {t.module}")
+    lines += ["", "Slowest modules (self):"]
+    for t in sorted(times, key=lambda t: t.self, reverse=True)[:top]:
+        lines.append(f"  {t.self:8.3f} s  {t.module}")
+    loaded = sorted({t.module.split(".")[0] for t in times} & {"scipy", "skimage"})
+    if loaded:
+        lines += ["", f"Imported at start up: {', '.join(loaded)}"]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        prog="python -m python_guis.startup",
+        description="Reports the time taken to import the frontends.",
+    )
+    parser.add_argument("modules", nargs="*", default=FRONTENDS)
+    parser.add_argument("--top", type=int, default=15, help="Modules listed.")
+    options = parser.parse_args()
+
+    for name in options.modules:
+        try:
+            print(report(name, options.top), end="\n\n")
+        except ImportError as err:
+            print(f"{name}: not available ({err})\n")
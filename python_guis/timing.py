@@ -0,0 +1,208 @@
+"""Lightweight timing of the stages of the segmentation and of the drawing.
+
+The model and the frontends mark their slow stages with named spans:
+
+    with timing.span("filter"):
+        fimg = filtered_image(image, sigma)
+
+Recording is disabled by default, and then a span just returns a shared do-nothing
+context manager. Enable it with `timing.enable()` or by setting the environment
+variable PYTHON_GUIS_TIMING=1. The recorded spans can be summarised, shown in the
+status bar of the GUIs or exported as JSON or as a Chrome trace, to be opened with
+chrome://tracing or https://ui.perfetto.dev.
+
+Spans are recorded per process, so those of the workers of `model.segment_many` are
+not collected.
+"""
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+import json
+import os
+from pathlib import Path
+from threading import Lock, get_ident
+from time import perf_counter
+from typing import Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Union
+
+STAGES = ("filter", "spline", "snake", "add_node", "draw")
+"""Spans shown by the status bars of the GUIs, in this order."""
+
+
+class Span(NamedTuple):
+    name: str
+    start: float
+    duration: float
+    thread: int
+
+
+class SpanStats(NamedTuple):
+    calls: int
+    total: float
+    mean: float
+    max: float
+    last: float
+
+
+_enabled = os.environ.get("PYTHON_GUIS_TIMING", "0") == "1"
+_spans: Deque[Span] = deque(maxlen=10000)
+_stats: Dict[str, SpanStats] = {}
+_lock = Lock()
+_null = nullcontext()
+_listeners: List[Callable[[Span], None]] = []
+
+
+def enable(max_spans: Optional[int] = None):
+    """Starts recording spans, keeping at most max_spans of the most recent ones."""
+    global _enabled, _spans
+    with _lock:
+        if max_spans is not None:
+            _spans = deque(_spans, maxlen=max_spans)
+        _enabled = True
+
+
+def disable():
+    """Stops recording spans. Those already recorded are kept."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str):
+    """Context manager recording the time spent in its block under this name."""
+    return _record(name) if _enabled else _null
+
+
+def _updated(stats: Optional[SpanStats], duration: float) -> SpanStats:
+    """The statistics of a name after recording one more span with it."""
+    if stats is None:
+        return SpanStats(1, duration, duration, duration, duration)
+    calls, total = stats.calls + 1, stats.total + duration
+    return SpanStats(calls, total, total / calls, max(stats.max, duration), duration)
+
+
+@contextmanager
+def _record(name: str) -> Iterator[None]:
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        new = Span(name, start, perf_counter() - start, get_ident())
+        with _lock:
+            _spans.append(new)
+            _stats[name] = _updated(_stats.get(name), new.duration)
+            listeners = list(_listeners)
+        for listener in listeners:
+            listener(new)
+
+
+def timed(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Decorator recording each call of the function as a span.
+
+    The span is named after the function, unless a name is given.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _record(label):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def subscribe(listener: Callable[[Span], None]) -> Callable[[], None]:
+    """Calls listener with every new span, returning a function to unsubscribe.
+
+    The listener is called from the thread that recorded the span.
+    """
+    with _lock:
+        _listeners.append(listener)
+
+    def unsubscribe():
+        with _lock:
+            if listener in _listeners:
+                _listeners.remove(listener)
+
+    return unsubscribe
+
+
+def spans() -> List[Span]:
+    """The recorded spans, oldest first."""
+    with _lock:
+        return list(_spans)
+
+
+def clear():
+    """Forgets the recorded spans and their statistics."""
+    with _lock:
+        _spans.clear()
+        _stats.clear()
+
+
+def summary() -> Dict[str, SpanStats]:
+    """Statistics of the duration of the spans with each name.
+
+    They are updated as the spans are recorded, so they include all the spans since
+    the last clear, even those no longer kept, and are cheap to get at any time.
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def readout(names=STAGES) -> str:
+    """Short text with the last duration of each stage, eg. for a status bar."""
+    stats = summary()
+    parts = [f"{name} {_format(stats[name].last)}" for name in names if name in stats]
+    return " | ".join(parts)
+
+
+def _format(seconds: float) -> str:
+    return f"{seconds:.2f} s" if seconds >= 1 else f"{seconds * 1000:.1f} ms"
+
+
+def to_json(path: Optional[Union[str, Path]] = None) -> str:
+    """The recorded spans and their summary as JSON, optionally saved to path.
+
+    Times are in seconds, with the start relative to the first span recorded.
+    """
+    recorded = spans()
+    origin = recorded[0].start if recorded else 0.0
+    text = json.dumps(
+        dict(
+            spans=[dict(s._asdict(), start=s.start - origin) for s in recorded],
+            summary={name: s._asdict() for name, s in summary().items()},
+        ),
+        indent=2,
+    )
+    if path is not None:
+        Path(path).write_text(text)
+    return text
+
+
+def to_chrome_trace(path: Optional[Union[str, Path]] = None) -> str:
+    """The recorded spans in the Chrome trace event format, optionally saved to path."""
+    pid = os.getpid()
+    events = [
+        dict(
+            name=s.name,
+            ph="X",
+            ts=s.start * 1e6,
+            dur=s.duration * 1e6,
+            pid=pid,
+            tid=s.thread,
+        )
+        for s in spans()
+    ]
+    text = json.dumps(dict(traceEvents=events, displayTimeUnit="ms"))
+    if path is not None:
+        Path(path).write_text(text)
+    return text
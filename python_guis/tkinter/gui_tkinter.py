@@ -1,40 +1,78 @@
+import sys
 import tkinter as tk
-from tkinter import ttk
+from tkinter import filedialog, messagebox, ttk
 from pathlib import Path
+from threading import Event
 
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 
-from python_guis import INSECTS
-from python_guis.model import add_node, segment_one_image
-from skimage.io import imread
+from python_guis import INSECTS, timing
+from python_guis.images import segment_source
+from python_guis.jobs import JobRunner, LivePreview, tk_dispatcher, tk_scheduler
+from python_guis.model import Cancelled
+from python_guis.navigator import Navigator
+from python_guis.nodes import NodeEditor
+from python_guis.results import default_store
+from python_guis.startup import prewarm
 
 
 class BeetlePicker(tk.Tk):
-    def __init__(self):
+    def __init__(self, folder=None):
         super().__init__()
         self.title("Beetle Picker")
 
         self.filename = ""
         self.image = None
-        self.nodes = []
+        self.source = None
+        self.navigator = Navigator([INSECTS])
+        self.loading = None
+        self.editor = None
+        self.runner = JobRunner(tk_dispatcher(self))
+        self.cancel = Event()
+        self.job = None
+        self.store = default_store()
+        self.preview = LivePreview(
+            self.runner,
+            tk_scheduler(self),
+            segment_source,
+            on_done=self.show_preview,
+            on_error=self.preview_failed,
+        )
+        self.preview_lines = []
+        self.result_lines = []
+        self.last_result = None
 
         # gui variables
         self.sigma_scale = tk.IntVar(value=1)
         self.sigma_label = tk.StringVar(value=1)
         self.spline_resolution = tk.IntVar(value=360)
         self.spline_degree = tk.IntVar(value=3)
+        self.pyramid_levels = tk.IntVar(value=1)
+        self.live_preview = tk.BooleanVar(value=False)
+        self.show_timings = tk.BooleanVar(value=timing.is_enabled())
+        self.status = tk.StringVar(value="")
         self.segment_button = None
         self.remove_all_segments_button = None
+        self.progress = None
         self.fig = None
         self.axes = None
+        self.status_bar = None
+        self.unsubscribe = None
 
         # create the GUI
         self.create_gui()
 
         # read image
-        self.read_image()
+        if folder is None:
+            self.read_image()
+        else:
+            self.open_folder(folder)
+
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        # import the segmentation libraries once the window is shown
+        self.after_idle(prewarm)
 
     def create_gui(self):
         """Creates the widgets and link them to the GUI variables."""
@@ -50,12 +88,35 @@ class BeetlePicker(tk.Tk):
         canvas = FigureCanvasTkAgg(self.fig, master=self)
         canvas.draw()
         canvas.get_tk_widget().grid(column=1, row=0, sticky=tk.NSEW)
+        self.editor = NodeEditor(
+            self.axes,
+            canvas,
+            on_change=self.nodes_changed,
+            on_new_contour=self.new_contour,
+            can_edit=self.can_edit,
+        )
 
         # The main frame, which will hold all the widgets except the plot
         mainframe = ttk.Frame(self, width=300)
         mainframe.grid(column=0, row=0, sticky=tk.NSEW, ipadx=15, ipady=15)
         mainframe.columnconfigure(1, weight=1)
 
+        # Images of a folder
+        navigation = ttk.Frame(mainframe)
+        navigation.grid(row=0, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
+        navigation.columnconfigure(0, weight=1)
+        ttk.Button(navigation, text="Open folder...", command=self.open_folder).grid(
+            row=0, column=0, sticky=tk.NSEW
+        )
+        ttk.Button(navigation, text="<", width=3, command=self.show_previous).grid(
+            row=0, column=1, sticky=tk.NSEW
+        )
+        ttk.Button(navigation, text=">", width=3, command=self.show_next).grid(
+            row=0, column=2, sticky=tk.NSEW
+        )
+        self.bind("<Prior>", self.show_previous)
+        self.bind("<Next>", self.show_next)
+
         # Gaussian filter
         ttk.Label(mainframe, text="Gaussian filter width: ").grid(
             row=1, columnspan=2, sticky=tk.NSEW, padx=5, pady=5
@@ -93,6 +154,27 @@ class BeetlePicker(tk.Tk):
             row=5, column=1, sticky=tk.NSEW, padx=5, pady=5
         )
 
+        # Coarse to fine segmentation
+        ttk.Label(mainframe, text="Pyramid levels:").grid(
+            row=6, sticky=tk.NSEW, padx=5, pady=5
+        )
+        ttk.Spinbox(
+            mainframe, from_=1, to=5, textvariable=self.pyramid_levels, width=5
+        ).grid(row=6, column=1, sticky=tk.NSEW, padx=5, pady=5)
+
+        # Re-segment automatically when the parameters change
+        ttk.Checkbutton(
+            mainframe, text="Live preview", variable=self.live_preview
+        ).grid(row=7, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
+        for variable in (
+            self.sigma_scale,
+            self.spline_resolution,
+            self.spline_degree,
+            self.pyramid_levels,
+            self.live_preview,
+        ):
+            variable.trace_add("write", self.parameters_changed)
+
         # Perform segmentation
         self.segment_button = ttk.Button(
             mainframe,
@@ -100,7 +182,9 @@ class BeetlePicker(tk.Tk):
             command=self.perform_segmentation,
             state=tk.DISABLED,
         )
-        self.segment_button.grid(row=6, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
+        self.segment_button.grid(row=8, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
+        self.progress = ttk.Progressbar(mainframe, orient=tk.HORIZONTAL, maximum=1)
+        self.progress.grid(row=9, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
 
         # Remove data
         self.remove_all_segments_button = ttk.Button(
@@ -110,71 +194,285 @@ class BeetlePicker(tk.Tk):
             state=tk.DISABLED,
         )
         self.remove_all_segments_button.grid(
-            row=7, columnspan=2, sticky=(tk.S, tk.W, tk.E), padx=5, pady=5
+            row=10, columnspan=2, sticky=(tk.S, tk.W, tk.E), padx=5, pady=5
+        )
+
+        # Time taken by the last segmentation and drawing
+        ttk.Checkbutton(
+            mainframe,
+            text="Show timings",
+            variable=self.show_timings,
+            command=self.toggle_timings,
+        ).grid(row=11, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
+        self.status_bar = ttk.Label(
+            self, textvariable=self.status, relief=tk.SUNKEN, anchor=tk.W
         )
+        self.unsubscribe = timing.subscribe(self.runner.main_loop(self.show_timing))
+        self.toggle_timings()
 
     def remove_all_segmentations(self):
         """Removes all segmentations from memory."""
-        self.nodes = []
+        self.preview.stop()
+        self.last_result = None
+        self.editor.clear()
         self.remove_all_segments_button.configure(state=tk.DISABLED)
         self.axes.lines.clear()
         self.axes.get_legend().remove()
         self.fig.canvas.draw()
 
-    def add_node(self, event):
-        """Adds a node to the plot."""
-        if len(self.nodes) == 0:
-            self.axes.lines.clear()
+    @property
+    def nodes(self):
+        """Nodes of the initial contour, edited with the mouse."""
+        return self.editor.nodes
 
-        add_node(event, self.nodes, self.fig.canvas)
+    def can_edit(self):
+        """Nodes can be edited unless a segmentation is running."""
+        return self.job is None or self.job.done()
 
-        if len(self.nodes) >= 3:
-            self.segment_button.configure(state=tk.NORMAL)
+    def new_contour(self):
+        """Removes the previous contours when starting a new one."""
+        self.axes.lines.clear()
+
+    def nodes_changed(self, nodes):
+        """Lets the user segment with 3 nodes or more, previewing it if enabled."""
+        state = tk.NORMAL if len(nodes) >= 3 else tk.DISABLED
+        self.segment_button.configure(state=state)
+        self.parameters_changed()
 
+    @timing.timed("draw")
     def redraw(self, segment=None, initial=None):
         """Redraws the axes after making a changes to the data."""
 
         if initial is not None:
-            self.axes.plot(*initial.T, color="blue", label="Initial")
+            line = self.axes.plot(*initial.T, color="blue", label="Initial")[0]
+            self.result_lines.append(line)
 
         if segment is not None:
-            self.axes.plot(*segment.T, color="orange", label="Segmented")
+            line = self.axes.plot(*segment.T, color="orange", label="Segmented")[0]
+            self.result_lines.append(line)
 
         if segment is not None or initial is not None:
             self.axes.legend()
 
         self.fig.canvas.draw()
 
+    @timing.timed("draw")
     def draw(self):
         """Initial drawing of the plot."""
-        self.axes.imshow(self.image, cmap=plt.get_cmap("binary_r"))
+        self.axes.clear()
+        self.axes.get_xaxis().set_visible(False)
+        self.axes.get_yaxis().set_visible(False)
+        image, extent = self.source.display()
+        self.axes.imshow(image, extent=extent, cmap="binary_r")
         self.axes.set_title(
-            "Left click to add a control node.\n"
-            "At least 3 are needed to perform a segmentation."
+            "Left click to add a control node, drag it to move it and right click\n"
+            "to delete it. At least 3 are needed to perform a segmentation."
         )
+        self.fig.canvas.draw()
 
     def perform_segmentation(self):
-        """Gets all the parameters from the widgets and performs the segmentation."""
-        sigma = self.sigma_scale.get()
-        resolution = self.spline_resolution.get()
-        degree = self.spline_degree.get()
+        """Gets all the parameters from the widgets and starts the segmentation.
+
+        The segmentation runs in the background, so the window is still responsive.
+        It continues from the last result if only the parameters changed since.
+        """
+        try:
+            parameters = self.parameters()
+        except tk.TclError as err:
+            messagebox.showerror("Invalid parameters", str(err), parent=self)
+            return
+
+        self.preview.stop()
+        self.segment_button.configure(state=tk.DISABLED)
+        self.progress.configure(value=0)
+        self.job = self.runner.submit(
+            segment_source,
+            self.source,
+            list(self.nodes),
+            store=self.store,
+            previous=self.last_result,
+            **parameters,
+            callback=self.runner.main_loop(self.show_progress),
+            cancel=self.cancel,
+            on_done=self.segmentation_done,
+            on_error=self.segmentation_failed,
+        )
 
-        segment, initial = segment_one_image(
-            self.image, self.nodes, sigma=sigma, resolution=resolution, degree=degree
+    def parameters(self):
+        """Gets the segmentation parameters from the widgets."""
+        return dict(
+            sigma=self.sigma_scale.get(),
+            resolution=self.spline_resolution.get(),
+            degree=self.spline_degree.get(),
+            levels=self.pyramid_levels.get(),
         )
 
+    def parameters_changed(self, *args):
+        """Segments again in the background with the new parameters, if previewing."""
+        self.navigator.sigma = self.sigma_scale.get()
+        try:
+            parameters = self.parameters()
+        except tk.TclError:
+            # The resolution is not a valid number while it is being edited
+            parameters = None
+        else:
+            self.editor.set_spline(parameters["resolution"], parameters["degree"])
+
+        if not self.live_preview.get() or len(self.nodes) < 3:
+            self.hide_preview()
+        elif parameters is not None:
+            # Continues from the last result if only the parameters changed
+            self.preview.update(
+                self.source,
+                list(self.nodes),
+                store=self.store,
+                previous=self.last_result,
+                **parameters,
+            )
+
+    def show_preview(self, result):
+        """Replaces the previous preview with a new one."""
+        self.remove_preview()
+        self.last_result = result
+        self.preview_lines = [
+            self.axes.plot(*result.initial.T, "--", color="blue", label="Preview")[0],
+            self.axes.plot(*result.contour.T, "--", color="orange")[0],
+        ]
+        self.axes.legend()
+        self.redraw()
+
+    def remove_preview(self):
+        """Removes the lines of the preview, if still in the plot."""
+        for line in self.preview_lines:
+            if line in self.axes.lines:
+                line.remove()
+        if self.preview_lines and self.axes.get_legend() is not None:
+            self.axes.legend()
+        self.preview_lines = []
+
+    def hide_preview(self):
+        """Stops previewing, removing the last preview from the plot."""
+        self.preview.stop()
+        if self.preview_lines:
+            self.remove_preview()
+            self.redraw()
+
+    def preview_failed(self, error):
+        """Reports a failed preview, turning previewing off."""
+        self.live_preview.set(False)
+        if not isinstance(error, Cancelled):
+            messagebox.showerror("Preview failed", str(error), parent=self)
+
+    def show_progress(self, iterations, total, displacement):
+        """Updates the progress bar with the fraction of iterations done."""
+        self.progress.configure(value=iterations / total)
+
+    def segmentation_done(self, result):
+        """Shows the result of a segmentation."""
+        self.progress.configure(value=1)
         self.remove_all_segments_button.configure(state=tk.NORMAL)
-        self.segment_button.configure(state=tk.DISABLED)
-
-        self.nodes = []
-        self.redraw(segment, initial)
+        self.segment_button.configure(state=tk.NORMAL)
+
+        # The nodes are kept, so the contour can be tweaked and segmented again
+        self.last_result = result
+        self.remove_preview()
+        self.remove_result()
+        self.redraw(result.contour, result.initial)
+
+    def remove_result(self):
+        """Removes the lines of the last segmentation, if still in the plot."""
+        for line in self.result_lines:
+            if line in self.axes.lines:
+                line.remove()
+        self.result_lines = []
+
+    def segmentation_failed(self, error):
+        """Reports a failed segmentation, letting the user try again."""
+        self.progress.configure(value=0)
+        self.segment_button.configure(state=tk.NORMAL)
+        if not isinstance(error, Cancelled):
+            messagebox.showerror("Segmentation failed", str(error), parent=self)
+
+    def toggle_timings(self):
+        """Starts or stops timing the stages, showing them in the status bar."""
+        if self.show_timings.get():
+            timing.enable()
+            self.status_bar.grid(row=1, columnspan=2, sticky=tk.EW)
+        else:
+            timing.disable()
+            self.status_bar.grid_remove()
+
+    def show_timing(self, span):
+        """Updates the status bar with the latest timings."""
+        self.status.set(timing.readout())
+
+    def close(self):
+        """Cancels any running segmentation and closes the window."""
+        self.unsubscribe()
+        self.cancel.set()
+        self.preview.stop()
+        self.navigator.shutdown()
+        self.runner.shutdown()
+        self.destroy()
+
+    def open_folder(self, folder=None):
+        """Goes through the images of the folder, asking for it if not given."""
+        folder = folder or filedialog.askdirectory(parent=self, title="Open folder")
+        if not folder:
+            return
+
+        try:
+            navigator = Navigator.from_folder(folder, sigma=self.sigma_scale.get())
+        except (OSError, ValueError) as err:
+            messagebox.showerror("Can not open folder", str(err), parent=self)
+            return
+        self.navigator.shutdown()
+        self.navigator = navigator
+        self.read_image()
 
-    def read_image(self, *args):
-        """Opens the image to segment."""
-        self.image = imread(INSECTS, as_gray=True)
+    def show_next(self, *args):
+        """Moves to the next image of the folder."""
+        self.read_image(self.navigator.next)
+
+    def show_previous(self, *args):
+        """Moves to the previous image of the folder."""
+        self.read_image(self.navigator.previous)
+
+    def read_image(self, move=None):
+        """Opens the image to segment, unless a segmentation is running.
+
+        Images are loaded in the background - see Navigator - and shown once ready.
+        """
+        if self.job is not None and not self.job.done():
+            return
+
+        self.loading = (move or self.navigator.current)()
+        self.loading.add_done_callback(self.runner.main_loop(self.image_loaded))
+
+    def image_loaded(self, future):
+        """Shows the image just loaded, unless another one was requested since."""
+        if future is not self.loading or future.cancelled():
+            return
+        if future.exception() is not None:
+            messagebox.showerror(
+                "Can not open image", str(future.exception()), parent=self
+            )
+            return
+
+        self.source = future.result()
+        self.image = self.source.data
+        self.title(
+            f"Beetle Picker - {self.navigator.describe()} {self.source.describe()}"
+        )
+        self.preview.stop()
+        self.preview_lines = []
+        self.last_result = None
+        self.editor.clear()
+        self.segment_button.configure(state=tk.DISABLED)
+        self.remove_all_segments_button.configure(state=tk.DISABLED)
+        self.progress.configure(value=0)
         self.draw()
-        self.fig.canvas.mpl_connect("button_release_event", self.add_node)
 
 
 if __name__ == "__main__":
-    BeetlePicker().mainloop()
+    BeetlePicker(*sys.argv[1:2]).mainloop()
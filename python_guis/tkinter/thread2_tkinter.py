@@ -3,19 +3,29 @@ This example has been adapted from:
 https://stackoverflow.com/a/29729649/3778792
 
 All credit to its authors.
+
+The worker thread does not touch the widgets, as Tk is not thread safe. Instead, it
+reports its progress through a ProgressChannel, many thousands of times, and the
+main loop updates the widgets with the latest report at most 30 times per second.
 """
 from threading import Thread
-from time import sleep
+from time import perf_counter, sleep
 import tkinter as tk
 from tkinter import ttk
 
+from python_guis.progress import ProgressChannel, tk_pump
+
+STEPS = 150000
+
 
-def on_loading(widget, status):
-    status("Loading...")
-    widget.start(150)
-    sleep(15)
-    widget.stop()
-    status("Now ready to work...")
+def on_loading(channel, duration=15):
+    channel.status("Loading...")
+    start = perf_counter()
+    for step in range(1, STEPS + 1):
+        # Simulate some work, reporting progress after every step
+        sleep(max(start + duration * step / STEPS - perf_counter(), 0))
+        channel.progress(step, STEPS)
+    channel.status("Now ready to work...")
 
 
 def main():
@@ -28,16 +38,23 @@ def main():
     label = ttk.Label(ft, text="")
     label.pack(expand=True, fill=tk.BOTH, side=tk.TOP)
 
-    def status(text):
-        label["text"] = text
-
-    pb_hd = ttk.Progressbar(
-        ft, orient="horizontal", mode="determinate", max=100, variable=0
-    )
+    pb_hd = ttk.Progressbar(ft, orient="horizontal", mode="determinate", max=100)
     pb_hd.pack(expand=True, fill=tk.BOTH, side=tk.TOP)
 
-    # Creates a thread that call on_loading
-    Thread(target=on_loading, args=(pb_hd, status)).start()
+    updates = 0
+
+    def show_progress(progress):
+        nonlocal updates
+        updates += 1
+        pb_hd["value"] = 100 * (progress.fraction or 0)
+        label[
+            "text"
+        ] = f"{progress.status} {progress.reports} reports, {updates} updates"
+
+    # Creates a thread that call on_loading, reporting through the channel
+    channel = ProgressChannel(show_progress, max_rate=30)
+    tk_pump(root, channel)
+    Thread(target=on_loading, args=(channel,), daemon=True).start()
     root.mainloop()
 
 
@@ -3,41 +3,80 @@ This example has been taken from:
 https://www.pythontutorial.net/tkinter/tkinter-thread-progressbar/
 
 All credits to its authors.
+
+It has been adapted to download the pictures with a DownloadManager, which streams
+them to disk in a bounded pool of threads and reports their progress and completion
+to the main loop, rather than it polling the threads. Pictures are also decoded and
+resized in those threads, leaving only the creation of the PhotoImage to the main
+loop, so the window does not freeze when a picture arrives. The time taken by each
+is shown below the picture. The downloaded files are kept in a temporary directory
+only until they are decoded.
+
+The URL can be given when running the example, eg. to download from a local server:
+
+    python -m http.server --directory python_guis/tkinter 8000
+    python -m python_guis.tkinter.thread_tkinter http://localhost:8000/1600x900.jpg
 """
-import requests
+from itertools import count
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+from time import perf_counter
 import tkinter as tk
-from threading import Thread
 from PIL import Image, ImageTk
-from tkinter import ttk
+from tkinter import messagebox, ttk
+from urllib.parse import urlparse
 
+from python_guis.downloads import DownloadManager
+from python_guis.jobs import tk_dispatcher
 
-class PictureDownload(Thread):
-    def __init__(self, url):
-        super().__init__()
+URL = "https://source.unsplash.com/random/1600x900"
 
-        self.picture_file = None
-        self.url = url
 
-    def run(self):
-        """download a picture and save it to a file"""
-        # download the picture
-        response = requests.get(self.url)
-        picture_name = self.url.split("/")[-1]
-        picture_file = f"{picture_name}.jpg"
+def fit(size, box):
+    """Largest size with the aspect ratio of size that fits in the box"""
+    scale = min(box[0] / size[0], box[1] / size[1])
+    return max(round(size[0] * scale), 1), max(round(size[1] * scale), 1)
+
 
-        # save the picture to a file
-        with open(picture_file, "wb") as f:
-            f.write(response.content)
+def load_picture(file_path, box):
+    """Decodes the picture and resizes it to fit in the box, away from the main loop
 
-        self.picture_file = picture_file
+    JPEG pictures are decoded directly at a reduced scale, the smallest one that is
+    still at least as large as the resized picture, which is much faster than
+    decoding them in full. Eg. a 1600x900 picture fits in a 640x480 box as 640x360,
+    so it is decoded at half scale, as 800x450.
+
+    The file is deleted once decoded. Returns the resized picture and the time taken.
+    """
+    start = perf_counter()
+    try:
+        with Image.open(file_path) as pil_img:
+            size = fit(pil_img.size, box)
+            pil_img.draft("RGB", size)
+
+            # resize the picture
+            resized_img = pil_img.convert("RGB").resize(size, Image.LANCZOS)
+            resized_img.load()
+    finally:
+        Path(file_path).unlink()
+    return resized_img, perf_counter() - start
 
 
 class App(tk.Tk):
-    def __init__(self, canvas_width, canvas_height):
+    def __init__(self, canvas_width, canvas_height, url=URL):
         super().__init__()
         self.resizable(0, 0)
         self.title("Image Viewer")
 
+        # Downloads in progress, with the bytes downloaded so far and their total
+        self.url = url
+        self.directory = tempfile.mkdtemp(prefix="pictures")
+        self.downloads = DownloadManager(tk_dispatcher(self), directory=self.directory)
+        self.numbers = count()
+        self.progress = {}
+
         # Progress frame
         self.progress_frame = ttk.Frame(self)
 
@@ -47,7 +86,7 @@ class App(tk.Tk):
 
         # progressbar
         self.pb = ttk.Progressbar(
-            self.progress_frame, orient=tk.HORIZONTAL, mode="indeterminate"
+            self.progress_frame, orient=tk.HORIZONTAL, mode="determinate", maximum=1
         )
         self.pb.grid(row=0, column=0, sticky=tk.EW, padx=10, pady=10)
 
@@ -74,47 +113,100 @@ class App(tk.Tk):
         btn["command"] = self.handle_download
         btn.grid(row=1, column=0)
 
+        # Time taken to prepare the last picture
+        self.timing = ttk.Label(self, text="")
+        self.timing.grid(row=2, column=0)
+
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
     def start_downloading(self):
         self.progress_frame.tkraise()
-        self.pb.start(20)
 
     def stop_downloading(self):
         self.picture_frame.tkraise()
         self.pb.stop()
+        self.pb.configure(mode="determinate", value=0)
 
-    def set_picture(self, file_path):
-        """Set the picture to the canvas"""
-        pil_img = Image.open(file_path)
-
-        # resize the picture
-        resized_img = pil_img.resize(
-            (self.canvas_width, self.canvas_height), Image.ANTIALIAS
-        )
-
+    def set_picture(self, picture):
+        """Set the picture, already decoded and resized, to the canvas"""
+        resized_img, decoding = picture
+        start = perf_counter()
         self.img = ImageTk.PhotoImage(resized_img)
 
-        # set background image
-        self.bg = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.img)
+        # set background image, centred as it keeps its aspect ratio
+        self.canvas.delete("all")
+        self.bg = self.canvas.create_image(
+            self.canvas_width // 2,
+            self.canvas_height // 2,
+            anchor=tk.CENTER,
+            image=self.img,
+        )
+        self.update_idletasks()
+        self.timing["text"] = (
+            f"Decoded in {decoding * 1000:.0f} ms in the background, "
+            f"shown in {(perf_counter() - start) * 1000:.0f} ms"
+        )
 
     def handle_download(self):
         """Download a random photo from unsplash"""
         self.start_downloading()
 
-        url = "https://source.unsplash.com/random/1600x900"
-        download_thread = PictureDownload(url)
-        download_thread.start()
-
-        self.monitor(download_thread)
+        number = next(self.numbers)
+        picture_name = Path(urlparse(self.url).path).stem
+        self.progress[number] = (0, None)
+        self.downloads.submit(
+            self.url,
+            f"{picture_name}_{number}.jpg",
+            on_progress=lambda done, total: self.show_progress(number, done, total),
+            on_done=lambda picture: self.downloaded(number, picture),
+            on_error=lambda error: self.failed(number, error),
+            process=lambda path: load_picture(
+                path, (self.canvas_width, self.canvas_height)
+            ),
+        )
+        self.show_progress(number, 0, None)
+
+    def show_progress(self, number, done, total):
+        """Shows the fraction downloaded of all the pictures in progress"""
+        if number not in self.progress:
+            return
+        self.progress[number] = (done, total)
+
+        # Without the size of all of them, only show that something is going on
+        sizes = [size for _, size in self.progress.values()]
+        if None in sizes:
+            if str(self.pb["mode"]) != "indeterminate":
+                self.pb.configure(mode="indeterminate")
+                self.pb.start(20)
+            return
+
+        if str(self.pb["mode"]) != "determinate":
+            self.pb.stop()
+            self.pb.configure(mode="determinate")
+        downloaded = sum(done for done, _ in self.progress.values())
+        self.pb.configure(value=downloaded / max(sum(sizes), 1))
+
+    def downloaded(self, number, picture):
+        """Shows the picture just downloaded"""
+        self.progress.pop(number, None)
+        if not self.progress:
+            self.stop_downloading()
+        self.set_picture(picture)
 
-    def monitor(self, download_thread):
-        """Monitor the download thread"""
-        if download_thread.is_alive():
-            self.after(100, lambda: self.monitor(download_thread))
-        else:
+    def failed(self, number, error):
+        """Reports a failed download"""
+        self.progress.pop(number, None)
+        if not self.progress:
             self.stop_downloading()
-            self.set_picture(download_thread.picture_file)
+        messagebox.showerror("Download failed", str(error), parent=self)
+
+    def close(self):
+        """Stops the downloads and closes the window"""
+        self.downloads.shutdown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.destroy()
 
 
 if __name__ == "__main__":
-    app = App(640, 480)
+    app = App(640, 480, *sys.argv[1:2])
     app.mainloop()
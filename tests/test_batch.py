@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pytest
+
+from python_guis.model import segment_many
+
+
+class Crash:
+    """Kills the worker process that receives it, as if it ran out of memory."""
+
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+@pytest.fixture
+def job():
+    rows, cols = np.mgrid[:64, :64]
+    image = ((rows - 32) ** 2 + (cols - 32) ** 2 < 15**2).astype(float)
+    t = np.linspace(0, 2 * np.pi, 8, endpoint=False)
+    nodes = np.c_[32 + 25 * np.cos(t), 32 + 25 * np.sin(t)]
+    return image, nodes, dict(max_num_iter=50)
+
+
+def test_failed_jobs_do_not_stop_the_batch(tmp_path, job):
+    image, nodes, params = job
+    jobs = [job, (tmp_path / "missing.png", nodes, params), job]
+    results = sorted(segment_many(jobs, workers=2), key=lambda r: r.job)
+
+    assert [r.job for r in results] == [0, 1, 2]
+    assert results[1].contour is None
+    assert "missing.png" in results[1].error
+    for result in (results[0], results[2]):
+        assert result.error is None
+        assert result.contour.shape == (360, 2)
+
+
+def test_crashed_workers_are_replaced(job):
+    image, nodes, params = job
+    jobs = [job] * 3 + [(Crash(), nodes, params)] + [job] * 4
+    results = sorted(segment_many(jobs, workers=2), key=lambda r: r.job)
+
+    assert [r.job for r in results] == list(range(8))
+    assert "BrokenProcessPool" in results[3].error
+    assert all(r.error is None for r in results if r.job != 3)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from python_guis.cache import ArrayCache, CacheInfo, image_key
+
+
+def array(value, size=100):
+    """An array of size bytes filled with value."""
+    return np.full(size, value, dtype=np.uint8)
+
+
+def test_byte_budget():
+    cache = ArrayCache(max_bytes=250)
+    cache.put("a", array(1))
+    cache.put("b", array(2))
+    assert cache.info() == CacheInfo(0, 0, 0, 2, 200, 250)
+
+    cache.put("c", array(3))
+    info = cache.info()
+    assert (info.entries, info.nbytes, info.evictions) == (2, 200, 1)
+
+    # Replacing an entry does not count it twice
+    cache.put("c", array(4, 50))
+    assert cache.info().nbytes == 150
+
+    # An array larger than the whole budget is not kept
+    cache.put("d", array(5, 300))
+    assert cache.get("d") is None
+    assert cache.info().nbytes == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = ArrayCache(max_bytes=300)
+    for key in "abc":
+        cache.put(key, array(ord(key)))
+
+    assert cache.get("a") is not None
+    cache.put("d", array(4))
+    assert cache.get("b") is None
+    assert [key for key in "acd" if cache.get(key) is not None] == list("acd")
+
+    cache.max_bytes = 100
+    assert cache.get("d") is not None
+    assert cache.get("a") is None and cache.get("c") is None
+
+
+def test_statistics():
+    cache = ArrayCache()
+    computed = []
+
+    def compute():
+        computed.append(1)
+        return array(1)
+
+    first = cache.get_or_compute("a", compute)
+    second = cache.get_or_compute("a", compute)
+    assert first is second
+    assert len(computed) == 1
+    assert cache.get("b") is None
+    assert cache.info() == CacheInfo(1, 2, 0, 1, 100, 512 * 2**20)
+
+    cache.clear()
+    assert cache.info() == CacheInfo(1, 2, 0, 0, 0, 512 * 2**20)
+
+
+def test_disabled_cache():
+    cache = ArrayCache(max_bytes=0)
+    value = cache.put("a", array(1))
+
+    assert value[0] == 1
+    assert cache.get("a") is None
+    assert cache.info() == CacheInfo(0, 1, 1, 0, 0, 0)
+
+
+def test_arrays_are_read_only():
+    cache = ArrayCache()
+    value = cache.put("a", array(1))
+
+    with pytest.raises(ValueError):
+        value[0] = 2
+
+
+def test_image_key():
+    image = np.arange(12, dtype=float).reshape(3, 4)
+
+    assert image_key(image) == image_key(image.copy())
+    assert image_key(image) == image_key(np.asfortranarray(image))
+    assert image_key(image) != image_key(image.reshape(4, 3))
+    assert image_key(image) != image_key(image.astype(np.float32))
+    assert image_key(image[:, ::2]) == image_key(image[:, ::2].copy())
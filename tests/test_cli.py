@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from python_guis.cli import CONTOUR_SUFFIX, CONTOURS_FILE, from_directory, run
+from python_guis.contours import ContourFile
+
+PARAMS = dict(max_num_iter=50)
+
+
+@pytest.fixture
+def images(tmp_path):
+    from skimage.io import imsave
+
+    rows, cols = np.mgrid[:64, :64]
+    t = np.linspace(0, 2 * np.pi, 8, endpoint=False)
+    nodes = np.c_[32 + 25 * np.cos(t), 32 + 25 * np.sin(t)]
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for name, radius in (("a", 10), ("b", 15), ("c", 20)):
+        disk = (rows - 32) ** 2 + (cols - 32) ** 2 < radius**2
+        imsave(folder / f"{name}.png", (255 * disk).astype(np.uint8))
+        np.savetxt(folder / f"{name}.nodes.txt", nodes)
+    (folder / "c.nodes.txt").write_text("not a node file\n")
+    return folder
+
+
+def test_run_resumes_and_skips_broken_nodes(images, tmp_path):
+    output = tmp_path / "contours"
+    items = from_directory(images)
+    assert [item.name for item in items] == ["a", "b", "c"]
+
+    results = run(items, output, PARAMS, workers=1)
+    assert sorted(items[r.job].name for r in results) == ["a", "b"]
+    assert all(r.error is None for r in results)
+    assert sorted(p.name for p in output.iterdir()) == [
+        "a" + CONTOUR_SUFFIX,
+        "b" + CONTOUR_SUFFIX,
+    ]
+
+    # Finished items are skipped, and those missing segmented again
+    assert run(items, output, PARAMS, workers=1) == []
+    (output / ("b" + CONTOUR_SUFFIX)).unlink()
+    results = run(items, output, PARAMS, workers=1)
+    assert len(results) == 1
+    assert (output / ("b" + CONTOUR_SUFFIX)).exists()
+
+
+def test_run_binary(images, tmp_path):
+    output = tmp_path / "contours"
+    items = from_directory(images)[:2]
+    run(items[:1], output, PARAMS, workers=1, binary=True)
+    run(items, output, PARAMS, workers=1, binary=True)
+
+    contours = ContourFile(output / CONTOURS_FILE)
+    assert [metadata["name"] for _, metadata in contours] == ["a", "b"]
+    assert contours[0].shape == (360, 2)
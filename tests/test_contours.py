@@ -0,0 +1,39 @@
+import numpy as np
+
+from python_guis.contours import ContourFile, ContourWriter
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "contours.bin"
+    first = np.random.default_rng(0).random((50, 2))
+    second = first[:20].astype(np.float32)
+
+    with ContourWriter(path) as writer:
+        assert writer.append(first, name="first", nodes=np.ones((3, 2))) == 0
+        assert writer.append(second, name="second", sigma=2.5) == 1
+
+    contours = ContourFile(path)
+    assert len(contours) == 2
+    np.testing.assert_array_equal(contours[0], first)
+    assert contours[1].dtype == np.float32
+    np.testing.assert_array_equal(contours[1], second)
+    assert contours.metadata(0) == {"name": "first", "nodes": [[1.0, 1.0]] * 3}
+    assert contours.metadata(1) == {"name": "second", "sigma": 2.5}
+
+
+def test_partial_record_is_dropped(tmp_path):
+    path = tmp_path / "contours.bin"
+    with ContourWriter(path) as writer:
+        writer.append(np.zeros((10, 2)), name="complete")
+    complete = path.stat().st_size
+    with ContourWriter(path) as writer:
+        writer.append(np.ones((10, 2)), name="interrupted")
+    with path.open("r+b") as f:
+        f.truncate(path.stat().st_size - 8)
+
+    with ContourWriter(path) as writer:
+        assert path.stat().st_size == complete
+        assert writer.append(np.ones((5, 2)), name="next") == 1
+
+    contours = ContourFile(path)
+    assert [metadata["name"] for _, metadata in contours] == ["complete", "next"]
@@ -0,0 +1,107 @@
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from queue import SimpleQueue
+from threading import Thread
+
+import pytest
+
+pytest.importorskip("requests")
+
+from python_guis.downloads import DownloadManager  # noqa: E402
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    served = tmp_path / "served"
+    served.mkdir()
+    (served / "picture.bin").write_bytes(bytes(range(256)) * 4096)
+    handler = partial(QuietHandler, directory=str(served))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    # A stand-in for the main loop: callbacks are queued and run by run_main_loop
+    calls: SimpleQueue = SimpleQueue()
+    manager = DownloadManager(calls.put, directory=tmp_path / "out", chunk_size=1024)
+    manager.calls = calls
+    yield manager
+    manager.shutdown()
+
+
+def run_main_loop(downloads, future):
+    future.exception(timeout=30)
+    # on_done and on_error are queued by the download thread right after the future
+    # is done, so wait for the thread to finish
+    downloads.runner.shutdown(wait=True)
+    while not downloads.calls.empty():
+        downloads.calls.get()()
+
+
+def test_download(server, downloads, tmp_path):
+    progress, done = [], []
+    future = downloads.submit(
+        f"{server}/picture.bin",
+        on_progress=lambda *args: progress.append(args),
+        on_done=done.append,
+        on_error=pytest.fail,
+    )
+    run_main_loop(downloads, future)
+
+    path = tmp_path / "out" / "picture.bin"
+    assert done == [path]
+    assert path.read_bytes() == bytes(range(256)) * 4096
+    # Throttled, rather than once per chunk, but always reporting the end
+    assert 1 <= len(progress) < 1024
+    assert progress[-1] == (2**20, 2**20)
+
+
+def test_download_not_found(server, downloads, tmp_path):
+    import requests
+
+    errors = []
+    future = downloads.submit(
+        f"{server}/missing.bin", on_done=pytest.fail, on_error=errors.append
+    )
+    run_main_loop(downloads, future)
+
+    assert len(errors) == 1
+    assert isinstance(errors[0], requests.HTTPError)
+    assert "404" in str(errors[0])
+    assert list((tmp_path / "out").iterdir()) == []
+
+
+def test_process_runs_in_the_download_thread(server, downloads):
+    done = []
+    future = downloads.submit(
+        f"{server}/picture.bin",
+        filename="renamed.bin",
+        process=lambda path: (path.name, path.stat().st_size),
+        on_done=done.append,
+    )
+    run_main_loop(downloads, future)
+
+    assert done == [("renamed.bin", 2**20)]
+
+
+def test_pictures_are_deleted_once_decoded(tmp_path):
+    pytest.importorskip("tkinter")
+    from PIL import Image
+
+    from python_guis.tkinter.thread_tkinter import load_picture
+
+    path = tmp_path / "picture.jpg"
+    Image.new("RGB", (1600, 900), "red").save(path)
+    picture, _ = load_picture(path, (640, 480))
+
+    assert picture.size == (640, 360)
+    assert not path.exists()
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from python_guis.images import ImageSource, segment_source
+from python_guis.results import ResultStore
+
+
+@pytest.mark.parametrize("in_memory", (2**24, 0))
+def test_segmenting_again_warm_starts(tmp_path, in_memory):
+    from skimage import data
+
+    np.save(tmp_path / "camera.npy", data.camera()[::2, ::2] / 255)
+    source = ImageSource(
+        tmp_path / "camera.npy", cache_dir=tmp_path / "cache", in_memory=in_memory
+    )
+    store = ResultStore(tmp_path / "results.sqlite")
+    t = np.linspace(0, 2 * np.pi, 10, endpoint=False)
+    nodes = np.c_[128 + 80 * np.cos(t), 128 + 80 * np.sin(t)]
+
+    # As the GUIs do: the nodes are kept and the last result given as previous
+    first = segment_source(source, nodes, store=store, sigma=2)
+    cold = segment_source(source, nodes, sigma=3)
+    second = segment_source(source, nodes, store=store, sigma=3, previous=first)
+
+    assert second.iterations <= 250 < cold.iterations
+    np.testing.assert_allclose(second.initial, first.initial)
+    again = segment_source(source, nodes, store=store, sigma=3, previous=second)
+    np.testing.assert_array_equal(again.contour, second.contour)
+    store.close()
@@ -0,0 +1,141 @@
+from concurrent.futures import Executor, Future
+
+import pytest
+
+from python_guis.jobs import JobRunner, LivePreview
+
+
+class SynchronousExecutor(Executor):
+    """Runs the jobs as soon as they are submitted, in the calling thread."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+
+
+class FakeScheduler:
+    """Keeps the scheduled calls until run() is called, as a timer firing."""
+
+    def __init__(self):
+        self.pending = []
+        self.cancelled = 0
+
+    def __call__(self, delay, fn):
+        call = [delay, fn]
+        self.pending.append(call)
+
+        def cancel():
+            self.pending.remove(call)
+            self.cancelled += 1
+
+        return cancel
+
+    def run(self):
+        calls, self.pending = self.pending, []
+        for _, fn in calls:
+            fn()
+
+
+@pytest.fixture
+def preview():
+    """A live preview of squares with its scheduler, queued calls and results."""
+    calls = []
+    queued = []
+    runner = JobRunner(queued.append, executor=SynchronousExecutor())
+    schedule = FakeScheduler()
+
+    def square(x, cancel):
+        calls.append((x, cancel))
+        if x < 0:
+            raise ValueError(x)
+        return x * x
+
+    results = []
+    errors = []
+    preview = LivePreview(
+        runner, schedule, square, results.append, errors.append, delay=0.5
+    )
+    preview.calls = calls
+    preview.queued = queued
+    preview.results = results
+    preview.errors = errors
+    return preview
+
+
+def dispatch(queued):
+    """Calls the callables queued for the main loop."""
+    while queued:
+        queued.pop(0)()
+
+
+def test_updates_are_debounced(preview):
+    for x in range(5):
+        preview.update(x)
+
+    assert [delay for delay, _ in preview.schedule.pending] == [0.5]
+    assert preview.schedule.cancelled == 4
+    assert preview.calls == []
+
+    preview.schedule.run()
+    dispatch(preview.queued)
+    assert [x for x, _ in preview.calls] == [4]
+    assert preview.results == [16]
+
+
+def test_superseded_start_does_nothing(preview):
+    preview.update(2)
+    ((_, start),) = preview.schedule.pending
+    preview.update(3)
+
+    # Eg. a timer that already fired before being cancelled
+    start()
+    assert preview.calls == []
+
+    preview.schedule.run()
+    dispatch(preview.queued)
+    assert preview.results == [9]
+
+
+def test_obsolete_results_are_dropped(preview):
+    preview.update(2)
+    preview.schedule.run()
+    ((_, cancel),) = preview.calls
+    assert preview.queued
+
+    # A newer run starts before the result of the first one reaches the main loop
+    preview.update(3)
+    assert cancel.is_set()
+    dispatch(preview.queued)
+    assert preview.results == []
+
+    preview.schedule.run()
+    dispatch(preview.queued)
+    assert preview.results == [9]
+    assert not preview.calls[-1][1].is_set()
+
+
+def test_stop_drops_results_and_errors(preview):
+    preview.update(-1)
+    preview.schedule.run()
+    preview.stop()
+    dispatch(preview.queued)
+    assert preview.errors == []
+
+    preview.update(4)
+    preview.stop()
+    assert preview.schedule.pending == []
+    assert preview.results == []
+
+
+def test_errors_go_to_on_error(preview):
+    preview.update(-1)
+    preview.schedule.run()
+    dispatch(preview.queued)
+
+    (error,) = preview.errors
+    assert isinstance(error, ValueError)
+    assert preview.results == []
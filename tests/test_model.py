@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def image():
+    from skimage import data
+
+    return data.camera()[::2, ::2]
+
+
+@pytest.fixture
+def circle():
+    t = np.linspace(0, 2 * np.pi, 100, endpoint=False)
+    return np.c_[128 + 80 * np.sin(t), 128 + 80 * np.cos(t)]
+
+
+def test_snake_contour_matches_skimage(image, circle):
+    from skimage.filters import gaussian
+    from skimage.segmentation import active_contour
+
+    from python_guis.model import as_float, snake_contour
+
+    fimg = gaussian(as_float(image), 3, preserve_range=False)
+    params = dict(alpha=0.015, beta=10, gamma=0.001, max_num_iter=500)
+    expected = active_contour(fimg, circle, **params)
+    actual, iterations, _ = snake_contour(fimg, circle, **params)
+
+    assert iterations <= 500
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize("dtype", (np.float32, np.float64))
+@pytest.mark.parametrize("threads", (1, 2, 3, 8))
+def test_banded_gaussian_is_identical(dtype, threads):
+    from scipy.ndimage import gaussian_filter
+
+    from python_guis.model import gaussian
+
+    image = np.random.default_rng(1).random((700, 300)).astype(dtype)
+    expected = gaussian_filter(
+        image, 3, output=image.dtype, mode="nearest", truncate=4.0
+    )
+    actual = gaussian(image, 3, threads=threads)
+
+    assert actual.dtype == dtype
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_segment_keeps_unchanged_previous(image, circle):
+    from python_guis.model import segment
+
+    nodes = circle[::10, ::-1]
+    first = segment(image, nodes, sigma=2)
+
+    assert segment(image, nodes, sigma=2.0, previous=first) is first
+    warm = segment(image, nodes, sigma=3, previous=first, warm_iterations=50)
+    assert warm is not first
+    assert warm.iterations <= 50
+
+
+@pytest.fixture
+def ellipse():
+    rows, cols = np.mgrid[:256, :256]
+    inside = (rows - 128) ** 2 / 1.3 + (cols - 120) ** 2 < 60**2
+    noise = np.random.default_rng(0).normal(scale=0.1, size=inside.shape)
+    return inside + noise
+
+
+def edge_distance(contour):
+    x, y = contour.T
+    return np.abs(np.sqrt((y - 128) ** 2 / 1.3 + (x - 120) ** 2) - 60)
+
+
+@pytest.mark.parametrize("levels", (2, 3))
+def test_pyramid_matches_single_level(ellipse, levels):
+    from scipy.spatial import cKDTree
+
+    from python_guis.model import segment
+
+    t = np.linspace(0, 2 * np.pi, 10, endpoint=False)
+    nodes = np.c_[120 + 68 * np.cos(t), 128 + 68 * 1.14 * np.sin(t)]
+    single = segment(ellipse, nodes, sigma=3)
+    pyramid = segment(ellipse, nodes, sigma=3, levels=levels)
+
+    assert pyramid.converged
+    assert edge_distance(single.contour).max() < 1
+    assert edge_distance(pyramid.contour).max() < 1
+    distance = cKDTree(single.contour).query(pyramid.contour)[0]
+    assert distance.max() < 1.5
+
+
+def test_pyramid_does_not_copy_the_full_resolution_image(ellipse, monkeypatch):
+    import skimage.transform
+
+    from python_guis.model import pyramid_contour
+
+    factors = []
+    downscale = skimage.transform.downscale_local_mean
+
+    def recorded(image, factors_, *args, **kwargs):
+        factors.append(factors_)
+        return downscale(image, factors_, *args, **kwargs)
+
+    monkeypatch.setattr(skimage.transform, "downscale_local_mean", recorded)
+    t = np.linspace(0, 2 * np.pi, 100, endpoint=False)
+    initial = np.c_[128 + 70 * np.sin(t), 120 + 70 * np.cos(t)]
+    pyramid_contour(ellipse, initial, levels=3, level_iterations=10)
+
+    assert factors == [(4, 4), (2, 2)]
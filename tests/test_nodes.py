@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from matplotlib.backend_bases import MouseEvent
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from python_guis.nodes import SUPPORT, NodeEditor
+from python_guis.splines import contour_basis, splines
+
+
+@pytest.fixture
+def editor():
+    figure = Figure(figsize=(4, 4), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    axes = figure.add_axes((0, 0, 1, 1))
+    axes.imshow(np.zeros((200, 200)))
+    canvas.draw()
+    changes = []
+    editor = NodeEditor(axes, canvas, on_change=changes.append, tolerance=4)
+    editor.changes = changes
+    t = np.linspace(0, 2 * np.pi, 40, endpoint=False)
+    for x, y in np.c_[100 + 80 * np.cos(t), 100 + 80 * np.sin(t)]:
+        click(editor, "button_press_event", x, y)
+        click(editor, "button_release_event", x, y)
+    return editor
+
+
+def click(editor, name, x, y, button=1):
+    """Sends a mouse event at data coordinates (x, y) to the editor."""
+    xd, yd = editor.axes.transData.transform((x, y))
+    event = MouseEvent(name, editor.canvas, xd, yd, button=button)
+    editor.canvas.callbacks.process(name, event)
+
+
+def test_add_nodes(editor):
+    assert len(editor.nodes) == 40
+    assert len(editor.changes) == 40
+    np.testing.assert_allclose(editor.nodes[10], (100, 180), atol=1e-6)
+    np.testing.assert_allclose(editor.curve, splines(np.asarray(editor.nodes)))
+
+
+def test_drag_updates_the_curve_locally(editor):
+    basis = contour_basis(np.asarray(editor.nodes))
+    before = editor.curve.copy()
+    click(editor, "button_press_event", *editor.nodes[10])
+    click(editor, "motion_notify_event", 105, 170)
+
+    np.testing.assert_allclose(editor.nodes[10], (105, 170), atol=1e-6)
+    # While dragging, the spline is not fitted again, keeping the node parameters
+    dragged = np.hypot(5, 10)
+    expected = basis @ np.asarray(editor.nodes)
+    assert np.abs(editor.curve - expected).max() < SUPPORT * dragged
+    assert np.count_nonzero((editor.curve != before).any(axis=1)) < len(before) / 2
+    assert len(editor.changes) == 40
+
+    click(editor, "button_release_event", 105, 170)
+    assert len(editor.nodes) == 40
+    assert len(editor.changes) == 41
+    np.testing.assert_allclose(editor.curve, splines(np.asarray(editor.nodes)))
+
+
+def test_delete_node(editor):
+    removed = editor.nodes[5]
+    click(editor, "button_press_event", *removed, button=3)
+
+    assert len(editor.nodes) == 39
+    assert removed not in editor.nodes
+    np.testing.assert_allclose(editor.curve, splines(np.asarray(editor.nodes)))
+
+
+def test_pick_misses_away_from_nodes(editor):
+    assert editor.pick(100, 100, 4) is None
+    assert editor.pick(*editor.nodes[3], 4) == 3
+
+
+def test_drag_outside_the_axes(editor):
+    click(editor, "button_press_event", *editor.nodes[0])
+    click(editor, "motion_notify_event", 170, 110)
+    # Beyond the right edge of the axes, so the move is ignored
+    click(editor, "motion_notify_event", 260, 110)
+    np.testing.assert_allclose(editor.nodes[0], (170, 110), atol=1e-6)
+
+    click(editor, "button_release_event", 260, 110)
+    assert len(editor.nodes) == 40
+    np.testing.assert_allclose(editor.nodes[0], (170, 110), atol=1e-6)
+    np.testing.assert_allclose(editor.curve, splines(np.asarray(editor.nodes)))
@@ -0,0 +1,34 @@
+import gc
+import weakref
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from python_guis.model import node_overlay
+
+
+def test_overlay_is_reused():
+    figure = Figure()
+    canvas = FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    overlay = node_overlay(axes, canvas)
+    overlay.update([(0, 0), (1, 1), (1, 0)])
+
+    assert node_overlay(axes, canvas) is overlay
+    np.testing.assert_array_equal(overlay.line.get_xdata(), [0, 1, 1, 0])
+
+
+def test_figures_are_released():
+    figures = []
+    for _ in range(20):
+        figure = Figure()
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        axes.imshow(np.zeros((100, 100)))
+        node_overlay(axes, canvas).update([(10, 10), (20, 20), (20, 10)])
+        figures.append(weakref.ref(figure))
+    del figure, canvas, axes
+    gc.collect()
+
+    assert all(figure() is None for figure in figures)
@@ -0,0 +1,43 @@
+from threading import Thread
+
+from python_guis.progress import Progress, ProgressChannel
+
+
+def test_reports_are_coalesced():
+    updates = []
+    channel = ProgressChannel(updates.append)
+    for i in range(1000):
+        channel.progress(i + 1, 1000)
+        if i % 100 == 0:
+            channel.status(f"item {i}")
+
+    channel.flush()
+    assert updates == [Progress(1000, 1000, "item 900", 1010)]
+    assert updates[0].fraction == 1
+
+    channel.flush()
+    assert len(updates) == 1
+
+    channel.status("done")
+    channel.flush()
+    assert updates[-1] == Progress(1000, 1000, "done", 1011)
+
+
+def test_reports_from_threads():
+    updates = []
+    channel = ProgressChannel(updates.append)
+
+    def work():
+        for i in range(1000):
+            channel.progress(i + 1)
+
+    threads = [Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    channel.flush()
+
+    assert len(updates) == 1
+    assert updates[0].reports == 4000
+    assert updates[0].fraction is None
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from python_guis.model import Segmentation
+from python_guis.results import ResultStore, file_key, result_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(tmp_path / "results.sqlite")
+    yield store
+    store.close()
+
+
+def test_round_trip(store):
+    contour = np.random.default_rng(0).random((360, 2)).astype(np.float32)
+    initial = np.random.default_rng(1).random((360, 2))
+    store.put("key", Segmentation(contour, initial, 42, 1.5, True, "{}"))
+
+    result = store.get("key")
+    np.testing.assert_array_equal(result.contour, contour)
+    assert result.contour.dtype == np.float32
+    np.testing.assert_array_equal(result.initial, initial)
+    assert result[2:] == (42, 1.5, True, "{}")
+    assert store.get("other") is None
+    assert store.info().entries == 1
+
+    store.clear()
+    assert store.get("key") is None
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    store = ResultStore(tmp_path / "results.sqlite", max_bytes=2 * 360 * 2 * 8 * 2)
+    result = Segmentation(np.zeros((360, 2)), np.zeros((360, 2)), 1, 0.1, True)
+    store.put("first", result)
+    store.put("second", result)
+    store.get("first")
+    store.put("third", result)
+
+    assert store.get("second") is None
+    assert store.get("first") is not None
+    assert store.get("third") is not None
+    store.close()
+
+
+def test_result_key_normalises_parameters():
+    nodes = [(1, 2), (3, 4), (5, 6)]
+    key = result_key("image", nodes, dict(sigma=1))
+
+    assert result_key("image", nodes, dict(sigma=1.0)) == key
+    assert result_key("image", nodes, {}) == key
+    assert result_key("image", nodes, dict(sigma=1, dtype="float64")) == key
+    assert result_key("image", nodes, dict(sigma=2)) != key
+    assert result_key("image", nodes, dict(dtype="float32")) != key
+    assert result_key("other", nodes, {}) != key
+
+
+def test_file_key_changes_with_the_file(tmp_path):
+    path = tmp_path / "image.npy"
+    np.save(path, np.zeros((4, 4)))
+    key = file_key(path)
+
+    assert file_key(str(path)) == key
+    assert file_key(path, "float32") != key
+    np.save(path, np.zeros((5, 5)))
+    assert file_key(path) != key
+
+
+def test_result_key_depends_on_previous_contour():
+    nodes = [(1, 2), (3, 4), (5, 6)]
+    previous = Segmentation(np.zeros((10, 2)), np.zeros((10, 2)), 1, 0.1, True)
+    key = result_key("image", nodes, dict(previous=previous))
+
+    assert key != result_key("image", nodes, {})
+    assert key == result_key(
+        "image", nodes, dict(previous=previous._replace(elapsed=2))
+    )
+    moved = previous._replace(contour=np.ones((10, 2)))
+    assert result_key("image", nodes, dict(previous=moved)) != key
+
+
+def test_segment_many_stores_its_results(store, tmp_path):
+    from python_guis.model import segment_many
+
+    rows, cols = np.mgrid[:64, :64]
+    image = ((rows - 32) ** 2 + (cols - 32) ** 2 < 15**2).astype(float)
+    t = np.linspace(0, 2 * np.pi, 8, endpoint=False)
+    nodes = np.c_[32 + 25 * np.cos(t), 32 + 25 * np.sin(t)]
+    jobs = [
+        (image, nodes, dict(max_num_iter=50)),
+        (tmp_path / "missing.png", nodes, {}),
+    ]
+
+    first = sorted(segment_many(jobs, workers=1, store=store), key=lambda r: r.job)
+    assert store.info().entries == 1
+    again = sorted(segment_many(jobs, workers=1, store=store), key=lambda r: r.job)
+    np.testing.assert_array_equal(again[0].contour, first[0].contour)
+    assert again[0].elapsed == 0
+    assert again[1].error is not None
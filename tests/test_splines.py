@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("degree", (1, 3, 5))
+def test_splines_match_splprep(degree):
+    from python_guis.model import spline
+    from python_guis.splines import splines
+
+    rng = np.random.default_rng(0)
+    t = np.sort(rng.uniform(0, 2 * np.pi, 7))
+    nodes = np.c_[np.cos(t), np.sin(t)] * rng.uniform(50, 100, (7, 1))
+
+    expected = spline(nodes, resolution=90, degree=degree)
+    np.testing.assert_allclose(splines(nodes, 90, degree), expected, atol=1e-8)
+    batch = splines(np.stack([nodes, nodes + 10]), 90, degree)
+    np.testing.assert_allclose(batch[1], expected + 10, atol=1e-8)